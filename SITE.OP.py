@@ -2,11 +2,26 @@ import sys
 import os
 import streamlit as st
 import pandas as pd
+import numpy as np
 import sqlite3
 import json
+import re
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict, deque
+import csv
+import hashlib
+import itertools
+import tempfile
+import time
+import uuid
+import random
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
 from io import BytesIO
 import plotly.express as px
+import plotly.graph_objects as go
 
 
 
@@ -20,7 +35,8 @@ if sys.stdout.encoding != 'UTF-8':
 
 # --- 2. IMPORTAÇÃO DO SUPABASE ---
 try:
-    from supabase import create_client, Client
+    from supabase import create_client, Client, ClientOptions
+    import httpx
 except ImportError:
     st.error("🚨 Biblioteca 'supabase' não encontrada. Rode no terminal: pip install supabase")
     st.stop()
@@ -35,28 +51,423 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 # --- 4. CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="Santa Cruz Produção Master", layout="wide")
 
-if not os.path.exists("anexos"):
-    os.makedirs("anexos")
+PASTA_ANEXOS = "anexos"
+if not os.path.exists(PASTA_ANEXOS):
+    os.makedirs(PASTA_ANEXOS)
 
 # --- 5. CONEXÃO COM SUPABASE ---
 URL_SUPA = st.secrets["supabase"]["url"]
 KEY_SUPA = st.secrets["supabase"]["key"]
+CONFIG_SUPA = st.secrets["supabase"]
+
+
+class FalhaSupabase(Exception):
+    """A consulta não chegou ao fim (timeout, rede ou servidor fora do ar)."""
+
+
+class CircuitoAberto(FalhaSupabase):
+    """O disjuntor está aberto: nem tentamos chamar o servidor."""
+
+
+class DisjuntorSupabase:
+    """Circuit breaker: depois de várias falhas seguidas para de chamar o servidor por um tempo."""
+
+    def __init__(self, limite_falhas=5, tempo_aberto=30):
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.falhas = 0
+        self.aberto_em = None
+        self._testando = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        if self.aberto_em is None:
+            return "fechado"
+        if time.time() - self.aberto_em >= self.tempo_aberto:
+            return "meio-aberto"
+        return "aberto"
+
+    def permitir(self):
+        with self._lock:
+            estado = self.estado
+            if estado == "fechado":
+                return True
+            # Meio-aberto: deixa passar uma única chamada de teste
+            if estado == "meio-aberto" and not self._testando:
+                self._testando = True
+                return True
+            return False
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self.falhas = 0
+            self.aberto_em = None
+            self._testando = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas += 1
+            self._testando = False
+            if self.falhas >= self.limite_falhas or self.aberto_em is not None:
+                self.aberto_em = time.time()
+
+
+# Códigos do PostgREST/Postgres que indicam servidor degradado, não consulta errada:
+# PGRST000-003 = sem conexão com o banco ou pool esgotado (503/504),
+# 08xxx = conexão, 53xxx = falta de recursos, 57xxx = timeout/cancelamento
+PREFIXOS_INSTABILIDADE = ("PGRST000", "PGRST001", "PGRST002", "PGRST003", "08", "53", "57")
+
+
+def erro_de_instabilidade(erro):
+    """True se vale repetir a leitura e contar falha no disjuntor (5xx, gateway, timeout)."""
+    if isinstance(erro, (httpx.TransportError, json.JSONDecodeError)):
+        # JSONDecodeError: corpo em HTML de um gateway (502/504) no lugar do JSON
+        return True
+    codigo = getattr(erro, "code", None)
+    if codigo is None:
+        return False
+    codigo = str(codigo)
+    # Resposta sem JSON: o postgrest devolve o status HTTP como código
+    if codigo.isdigit() and len(codigo) == 3:
+        return int(codigo) >= 500
+    return codigo.startswith(PREFIXOS_INSTABILIDADE)
+
+
+class ClienteSupabaseResiliente:
+    """Cliente do Supabase com conexões persistentes, timeout, novas tentativas e disjuntor.
+
+    Gravações e consultas pontuais continuam por ``table()``; leituras de tabela
+    passam por ``ler()``, que repete a chamada em erros de rede/timeout e respostas 5xx.
+    """
+
+    def __init__(self, url, key, timeout=10, tentativas=3, espera_base=0.3, disjuntor=None):
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.disjuntor = disjuntor or DisjuntorSupabase()
+        # Um único pool HTTP por processo, com keep-alive entre os reruns
+        self.http = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+        )
+        self.cliente = create_client(url, key, options=ClientOptions(
+            httpx_client=self.http, postgrest_client_timeout=timeout
+        ))
+
+    def table(self, nome):
+        return self.cliente.table(nome)
+
+    def ler(self, montar_consulta):
+        """Executa uma leitura idempotente. ``montar_consulta`` recebe o cliente e devolve a query."""
+        if not self.disjuntor.permitir():
+            raise CircuitoAberto("Servidor instável; leituras suspensas temporariamente.")
+
+        for tentativa in range(self.tentativas):
+            try:
+                dados = montar_consulta(self.cliente).execute().data
+                self.disjuntor.registrar_sucesso()
+                return dados
+            except Exception as e:
+                if not erro_de_instabilidade(e):
+                    # O servidor respondeu (4xx, tabela/coluna inexistente): não é instabilidade
+                    self.disjuntor.registrar_sucesso()
+                    raise FalhaSupabase(str(e)) from e
+                erro = e
+                if tentativa < self.tentativas - 1:
+                    # Backoff exponencial com jitter para não sincronizar os processos
+                    time.sleep(random.uniform(0, self.espera_base * 2 ** tentativa))
+
+        self.disjuntor.registrar_falha()
+        raise FalhaSupabase(f"Sem resposta do servidor após {self.tentativas} tentativas: {erro}") from erro
+
 
 @st.cache_resource
 def conectar_supabase():
-    return create_client(URL_SUPA, KEY_SUPA)
+    return ClienteSupabaseResiliente(
+        URL_SUPA, KEY_SUPA,
+        timeout=CONFIG_SUPA.get("timeout", 10),
+        tentativas=CONFIG_SUPA.get("tentativas", 3),
+        espera_base=CONFIG_SUPA.get("espera_base", 0.3),
+        disjuntor=DisjuntorSupabase(
+            limite_falhas=CONFIG_SUPA.get("limite_falhas", 5),
+            tempo_aberto=CONFIG_SUPA.get("tempo_circuito_aberto", 30),
+        ),
+    )
 
 supabase = conectar_supabase()
 
+# --- 5.1 CACHE COMPARTILHADO ENTRE PROCESSOS ---
+# Rodamos vários processos do Streamlit atrás do balanceador. As tabelas ficam num
+# arquivo SQLite comum a todos os processos do servidor, com uma versão por tabela:
+# qualquer gravação sobe a versão e todos os processos passam a buscar de novo.
+CONFIG_CACHE = st.secrets.get("cache", {})
+
+
+class CacheCompartilhado:
+    """Cache em arquivo SQLite lido por todos os processos do mesmo servidor."""
+
+    def __init__(self, caminho, ttl=300, espera_trava=15, max_entradas=500, retencao=86400, max_memoria=64):
+        self.caminho = caminho
+        self.ttl = ttl
+        self.espera_trava = espera_trava
+        # Cada cliente/vendedor/líder tem sua própria chave: limitamos quantas ficam guardadas
+        self.max_entradas = max_entradas
+        self.retencao = retencao
+        self.max_memoria = max_memoria
+        # Cópia já convertida em DataFrame, para não decodificar o JSON a cada rerun (LRU)
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+
+        with self._conexao() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute('''CREATE TABLE IF NOT EXISTS versoes (
+                            tabela TEXT PRIMARY KEY,
+                            versao INTEGER NOT NULL)''')
+            db.execute('''CREATE TABLE IF NOT EXISTS entradas (
+                            chave TEXT PRIMARY KEY,
+                            versao INTEGER NOT NULL,
+                            dados TEXT NOT NULL,
+                            gravado_em REAL NOT NULL)''')
+            db.execute('''CREATE TABLE IF NOT EXISTS travas (
+                            chave TEXT PRIMARY KEY,
+                            expira_em REAL NOT NULL)''')
+
+    @contextmanager
+    def _conexao(self):
+        db = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    def _consultar(self, tabela, chave):
+        """Retorna (versão atual da tabela, DataFrame ou None se não houver cópia válida)."""
+        with self._conexao() as db:
+            linha = db.execute("SELECT versao FROM versoes WHERE tabela = ?", (tabela,)).fetchone()
+            versao = linha[0] if linha else 0
+            entrada = db.execute("SELECT versao, gravado_em FROM entradas WHERE chave = ?", (chave,)).fetchone()
+
+            if not entrada or entrada[0] != versao or time.time() - entrada[1] > self.ttl:
+                return versao, None
+
+            with self._lock:
+                memo = self._memoria.get(chave)
+                if memo:
+                    self._memoria.move_to_end(chave)
+            if memo and memo[0] == (versao, entrada[1]):
+                return versao, memo[1]
+
+            dados = db.execute("SELECT dados FROM entradas WHERE chave = ?", (chave,)).fetchone()
+            if not dados:
+                return versao, None
+
+        df = pd.DataFrame(json.loads(dados[0]))
+        with self._lock:
+            self._memoria[chave] = ((versao, entrada[1]), df)
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+        return versao, df
+
+    def _gravar(self, chave, versao_lida, registros, tabela):
+        # Só grava se ninguém invalidou a tabela enquanto buscávamos no Supabase
+        with self._conexao() as db:
+            db.execute('''INSERT OR REPLACE INTO entradas (chave, versao, dados, gravado_em)
+                          SELECT ?, ?, ?, ?
+                          WHERE COALESCE((SELECT versao FROM versoes WHERE tabela = ?), 0) = ?''',
+                       (chave, versao_lida, json.dumps(registros, default=str), time.time(), tabela, versao_lida))
+            # Despejo: some o que ninguém lê há um dia e, acima do limite, as cópias mais antigas
+            db.execute("DELETE FROM entradas WHERE gravado_em < ?", (time.time() - self.retencao,))
+            db.execute('''DELETE FROM entradas WHERE chave NOT IN
+                          (SELECT chave FROM entradas ORDER BY gravado_em DESC LIMIT ?)''', (self.max_entradas,))
+
+    def _pegar_trava(self, chave):
+        agora = time.time()
+        with self._conexao() as db:
+            db.execute("DELETE FROM travas WHERE chave = ? AND expira_em < ?", (chave, agora))
+            cursor = db.execute("INSERT OR IGNORE INTO travas (chave, expira_em) VALUES (?, ?)",
+                                (chave, agora + self.espera_trava))
+            return cursor.rowcount == 1
+
+    def _soltar_trava(self, chave):
+        with self._conexao() as db:
+            db.execute("DELETE FROM travas WHERE chave = ?", (chave,))
+
+    def carregar(self, tabela, chave, buscar):
+        """Lê do cache; se não houver cópia válida, só um processo do servidor chama buscar()."""
+        prazo = time.time() + self.espera_trava
+        dono_trava = False
+        while True:
+            versao, df = self._consultar(tabela, chave)
+            if df is not None:
+                return df.copy()
+            dono_trava = self._pegar_trava(chave)
+            if dono_trava or time.time() > prazo:
+                break
+            # Outro processo já está buscando: espera a cópia dele aparecer
+            time.sleep(0.2)
+
+        try:
+            registros = buscar()
+            self._gravar(chave, versao, registros, tabela)
+        finally:
+            if dono_trava:
+                self._soltar_trava(chave)
+        return pd.DataFrame(registros)
+
+    def versao(self, tabela):
+        with self._conexao() as db:
+            linha = db.execute("SELECT versao FROM versoes WHERE tabela = ?", (tabela,)).fetchone()
+        return linha[0] if linha else 0
+
+    def ultima_copia(self, chave):
+        """Última cópia gravada, mesmo vencida ou invalidada (usada quando o servidor cai)."""
+        with self._lock:
+            memo = self._memoria.get(chave)
+        if memo:
+            return memo[1].copy()
+        with self._conexao() as db:
+            dados = db.execute("SELECT dados FROM entradas WHERE chave = ?", (chave,)).fetchone()
+        return pd.DataFrame(json.loads(dados[0])) if dados else None
+
+    def invalidar(self, tabela):
+        with self._conexao() as db:
+            db.execute('''INSERT INTO versoes (tabela, versao) VALUES (?, 1)
+                          ON CONFLICT(tabela) DO UPDATE SET versao = versao + 1''', (tabela,))
+
+
+class CacheLocal:
+    """Cache só do processo atual (desenvolvimento ou servidor com um único processo)."""
+
+    def __init__(self, ttl=300, max_entradas=200):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._versoes = {}
+        self._lock = threading.Lock()
+
+    def carregar(self, tabela, chave, buscar):
+        with self._lock:
+            versao = self._versoes.get(tabela, 0)
+            entrada = self._entradas.get(chave)
+        if entrada and entrada[0] == versao and time.time() - entrada[1] < self.ttl:
+            return entrada[2].copy()
+
+        df = pd.DataFrame(buscar())
+        with self._lock:
+            if self._versoes.get(tabela, 0) == versao:
+                self._entradas[chave] = (versao, time.time(), df)
+                self._entradas.move_to_end(chave)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+        return df.copy()
+
+    def versao(self, tabela):
+        with self._lock:
+            return self._versoes.get(tabela, 0)
+
+    def ultima_copia(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+        return entrada[2].copy() if entrada else None
+
+    def invalidar(self, tabela):
+        with self._lock:
+            self._versoes[tabela] = self._versoes.get(tabela, 0) + 1
+
+
+@st.cache_resource
+def obter_cache():
+    backend = CONFIG_CACHE.get("backend", "sqlite")
+    ttl = CONFIG_CACHE.get("ttl", 300)
+    if backend == "memoria":
+        return CacheLocal(ttl=ttl)
+    return CacheCompartilhado(CONFIG_CACHE.get("caminho", "cache_compartilhado.db"), ttl=ttl)
+
+cache = obter_cache()
+
 # --- FUNÇÃO DE BUSCA DINÂMICA (MELHORADA) ---
-def buscar_dados(tabela):
+# Colunas que nunca vão para o cache (o arquivo do cache fica no disco do servidor)
+COLUNAS_SIGILOSAS = {"usuarios": ("senha",)}
+
+
+def sem_colunas_sigilosas(tabela, registros):
+    sigilosas = COLUNAS_SIGILOSAS.get(tabela)
+    if not sigilosas:
+        return registros
+    return [{k: v for k, v in linha.items() if k not in sigilosas} for linha in registros]
+
+
+def chave_cache(tabela, filtros=None):
+    if not filtros:
+        return tabela
+    return f"{tabela}?{json.dumps(filtros, sort_keys=True, ensure_ascii=False)}"
+
+
+def montar_consulta(cliente, tabela, filtros=None, colunas="*"):
+    consulta = cliente.table(tabela).select(colunas)
+    # Os filtros vão para o próprio Supabase: só as linhas permitidas trafegam
+    for coluna, valor in (filtros or {}).items():
+        consulta = consulta.eq(coluna, valor)
+    return consulta
+
+
+def carregar_tabela(tabela, filtros=None):
+    # Busca a tabela uma vez por servidor; os outros processos leem do cache.
+    # Não mostra nada na tela: levanta FalhaSupabase se o servidor não responder.
+    return cache.carregar(tabela, chave_cache(tabela, filtros),
+                          lambda: sem_colunas_sigilosas(
+                              tabela, supabase.ler(lambda c: montar_consulta(c, tabela, filtros))))
+
+
+def buscar_dados(tabela, filtros=None):
     try:
-        # Busca todos os dados da tabela
-        resposta = supabase.table(tabela).select("*").execute()
-        return pd.DataFrame(resposta.data)
+        return carregar_tabela(tabela, filtros)
     except Exception as e:
-        # Se a tabela ainda não existir, retorna DataFrame vazio sem travar o app
-        return pd.DataFrame()
+        # Não dá para usar "except FalhaSupabase": o cliente fica em cache_resource e
+        # as classes são recriadas a cada rerun do script, então o tipo não bate.
+        # Servidor fora do ar: usa a última cópia boa, avisando que pode estar desatualizada
+        df = cache.ultima_copia(chave_cache(tabela, filtros))
+        if df is not None:
+            st.warning(f"⚠️ Servidor instável: exibindo a última cópia salva de '{tabela}'.")
+            return df
+        st.error(f"🚨 Não foi possível consultar '{tabela}' no servidor: {e}")
+        # Marca o DataFrame para as páginas diferenciarem "vazio" de "falhou"
+        df = pd.DataFrame()
+        df.attrs["falha"] = True
+        return df
+
+
+# Coluna de "ordens" que limita o que cada nível enxerga (ADM e USER veem tudo).
+# responsavel_setor = líder da Montagem escolhido em "Distribuição Interna" na Nova OP
+ESCOPO_ORDENS = {
+    "CLIENTE": "cliente",
+    "VENDEDOR": "vendedor",
+    "LIDER": "responsavel_setor",
+}
+
+
+def filtros_escopo_ordens():
+    """Filtros das OPs conforme o nível logado; None quando o usuário vê todas."""
+    coluna = ESCOPO_ORDENS.get(st.session_state.get('nivel'))
+    if not coluna:
+        return None
+    # As OPs guardam o nome (não o login): vendedor/líder pelo nome do cadastro,
+    # cliente pelo nome da empresa, que é salvo em maiúsculas
+    nome = str(st.session_state.get('user_logado', '')).strip()
+    return {coluna: nome.upper() if coluna == "cliente" else nome}
+
+
+def invalidar_cache(tabela):
+    # Chamar depois de qualquer gravação para que todos os processos busquem de novo
+    try:
+        cache.invalidar(tabela)
+    except Exception:
+        pass
+    # Recalcula já os resultados prontos que dependem desta tabela (seção 7.4)
+    if 'agendador' in globals():
+        agendador.disparar(tabela)
 
 # --- 6. ESTADO DE SESSÃO (CORRIGIDO E COMPLETO) ---
 if 'auth' not in st.session_state:
@@ -87,22 +498,439 @@ if 'edit_op_id' not in st.session_state:
     st.session_state.edit_op_id = None
 
 # --- 7. BANCO DE DADOS LOCAL (PARA BACKUP DE SEGURANÇA) ---
+BANCO_LOCAL = 'fabrica_master.db'
+
+
 def iniciar_banco():
-    with sqlite3.connect('fabrica_master.db') as db:
+    with sqlite3.connect(BANCO_LOCAL) as db:
         cursor = db.cursor()
         # Tabela simplificada apenas para log local se necessário
         cursor.execute('''CREATE TABLE IF NOT EXISTS backup_logs (
                         id INTEGER PRIMARY KEY AUTOINCREMENT, 
                         evento TEXT, 
                         data_hora TEXT)''')
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # Fila dos eventos de checklist ainda não enviados ao Supabase
+        cursor.execute('''CREATE TABLE IF NOT EXISTS fila_eventos (
+                        id_evento TEXT PRIMARY KEY,
+                        payload TEXT NOT NULL)''')
+        # Indicadores pré-calculados, atualizados só com os eventos novos
+        cursor.execute('''CREATE TABLE IF NOT EXISTS rollup_pecas_dia (
+                        dia TEXT NOT NULL,
+                        setor TEXT NOT NULL,
+                        equipamento TEXT NOT NULL,
+                        concluidas INTEGER NOT NULL DEFAULT 0,
+                        reabertas INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (dia, setor, equipamento))''')
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_rollup_pecas_equipamento
+                        ON rollup_pecas_dia (equipamento, dia)''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS rollup_wip_dia (
+                        dia TEXT PRIMARY KEY,
+                        delta INTEGER NOT NULL DEFAULT 0)''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS rollup_lead_time (
+                        equipamento TEXT PRIMARY KEY,
+                        soma_dias INTEGER NOT NULL DEFAULT 0,
+                        qtd INTEGER NOT NULL DEFAULT 0)''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS estado_op (
+                        numero_op TEXT PRIMARY KEY,
+                        equipamento TEXT,
+                        progresso INTEGER NOT NULL,
+                        inicio TEXT NOT NULL)''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS cursor_eventos (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        ultimo_id INTEGER NOT NULL)''')
+        # Eventos já somados nos rollups, dentro da margem relida abaixo do cursor
+        cursor.execute('''CREATE TABLE IF NOT EXISTS eventos_aplicados (
+                        id_evento TEXT PRIMARY KEY,
+                        id INTEGER NOT NULL)''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS releitura_eventos (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        relida_em REAL NOT NULL)''')
+        # Anexos: o conteúdo é guardado uma única vez (pelo hash) e ligado a cada OP
+        cursor.execute('''CREATE TABLE IF NOT EXISTS objetos_anexo (
+                        sha256 TEXT PRIMARY KEY,
+                        caminho TEXT NOT NULL,
+                        tamanho INTEGER NOT NULL,
+                        miniatura TEXT,
+                        status_miniatura TEXT NOT NULL DEFAULT 'pendente')''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS anexos (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        numero_op TEXT NOT NULL,
+                        sha256 TEXT NOT NULL,
+                        nome_original TEXT,
+                        enviado_por TEXT,
+                        data_hora TEXT,
+                        UNIQUE (numero_op, sha256))''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_anexos_op ON anexos (numero_op)")
         db.commit()
 
 iniciar_banco()
 
 
+@contextmanager
+def conexao_local():
+    db = sqlite3.connect(BANCO_LOCAL, timeout=30)
+    try:
+        yield db
+        db.commit()
+    finally:
+        db.close()
+
+
+# --- 7.1 HISTÓRICO DE PROGRESSO (EVENTOS APPEND-ONLY) ---
+# Cada peça marcada/desmarcada no checklist vira uma linha em "eventos_progresso"
+# no Supabase (id bigint identity, id_evento uuid UNIQUE, numero_op, peca, acao,
+# usuario, setor, equipamento, progresso, data_op, data_hora). Nunca se altera
+# nem se apaga um evento.
+TAMANHO_LOTE_EVENTOS = 200
+INTERVALO_ENVIO_EVENTOS = 5
+
+
+class GravadorEventos:
+    """Envia os eventos ao Supabase em lotes, numa thread de fundo.
+
+    Os eventos entram primeiro na fila local (SQLite), então nada se perde se o
+    servidor estiver fora do ar ou se o processo reiniciar antes do envio. O
+    id_evento gerado aqui torna o reenvio de um lote inofensivo.
+    """
+
+    def __init__(self, intervalo=INTERVALO_ENVIO_EVENTOS, tamanho_lote=TAMANHO_LOTE_EVENTOS):
+        self.intervalo = intervalo
+        self.tamanho_lote = tamanho_lote
+        self.ultimo_erro = None
+        self._acordar = threading.Event()
+        threading.Thread(target=self._laco, name="gravador-eventos", daemon=True).start()
+
+    def registrar(self, eventos):
+        with conexao_local() as db:
+            db.executemany("INSERT OR IGNORE INTO fila_eventos (id_evento, payload) VALUES (?, ?)",
+                           [(e["id_evento"], json.dumps(e, default=str)) for e in eventos])
+            pendentes = db.execute("SELECT COUNT(*) FROM fila_eventos").fetchone()[0]
+        if pendentes >= self.tamanho_lote:
+            self._acordar.set()
+
+    def enviar_agora(self):
+        self._acordar.set()
+
+    def _laco(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                while self._enviar_lote():
+                    pass
+            except Exception as e:
+                # Continua na fila e tenta de novo no próximo ciclo
+                self.ultimo_erro = str(e)
+
+    def _enviar_lote(self):
+        with conexao_local() as db:
+            linhas = db.execute("SELECT id_evento, payload FROM fila_eventos ORDER BY rowid LIMIT ?",
+                                (self.tamanho_lote,)).fetchall()
+        if not linhas:
+            return False
+
+        supabase.table("eventos_progresso").upsert(
+            [json.loads(payload) for _, payload in linhas], on_conflict="id_evento", ignore_duplicates=True
+        ).execute()
+
+        with conexao_local() as db:
+            db.executemany("DELETE FROM fila_eventos WHERE id_evento = ?", [(i,) for i, _ in linhas])
+        self.ultimo_erro = None
+        # Os eventos já estão no Supabase: agora sim os indicadores têm o que buscar (seção 7.4)
+        if 'agendador' in globals():
+            agendador.disparar("eventos_progresso")
+        return len(linhas) == self.tamanho_lote
+
+
+@st.cache_resource
+def iniciar_gravador_eventos():
+    return GravadorEventos()
+
+gravador_eventos = iniciar_gravador_eventos()
+
+
+def registrar_eventos_checklist(numero_op, equipamento, data_op, antes, depois, progresso):
+    """Gera um evento por peça que mudou de estado entre o checklist salvo e o novo."""
+    agora = datetime.now().isoformat(timespec="seconds")
+    base = {
+        "numero_op": numero_op,
+        "equipamento": equipamento,
+        "data_op": data_op,
+        "progresso": progresso,
+        "usuario": st.session_state.get('id_user') or st.session_state.get('user_logado', ''),
+        "setor": st.session_state.get('cargo_logado', ''),
+        "data_hora": agora,
+    }
+    eventos = [dict(base, id_evento=str(uuid.uuid4()), peca=p, acao="concluida") for p in depois if p not in antes]
+    eventos += [dict(base, id_evento=str(uuid.uuid4()), peca=p, acao="reaberta") for p in antes if p not in depois]
+    if eventos:
+        gravador_eventos.registrar(eventos)
+
+
+# --- 7.2 INDICADORES DE PRODUTIVIDADE (ROLLUPS INCREMENTAIS) ---
+def _data_iso(data_br):
+    try:
+        return datetime.strptime(str(data_br), '%d/%m/%Y').date().isoformat()
+    except:
+        return None
+
+
+def _somar_wip(db, dia, delta):
+    db.execute('''INSERT INTO rollup_wip_dia (dia, delta) VALUES (?, ?)
+                  ON CONFLICT(dia) DO UPDATE SET delta = delta + excluded.delta''', (dia, delta))
+
+
+def _aplicar_evento(db, ev):
+    dia = str(ev.get('data_hora', ''))[:10]
+    equipamento = ev.get('equipamento') or "N/A"
+    concluida = 1 if ev.get('acao') == "concluida" else 0
+
+    db.execute('''INSERT INTO rollup_pecas_dia (dia, setor, equipamento, concluidas, reabertas)
+                  VALUES (?, ?, ?, ?, ?)
+                  ON CONFLICT(dia, setor, equipamento) DO UPDATE SET
+                      concluidas = concluidas + excluded.concluidas,
+                      reabertas = reabertas + excluded.reabertas''',
+               (dia, ev.get('setor') or "N/A", equipamento, concluida, 1 - concluida))
+
+    # WIP: a OP entra em produção na abertura e sai quando chega a 100%
+    novo = int(ev.get('progresso') or 0)
+    estado = db.execute("SELECT progresso, inicio FROM estado_op WHERE numero_op = ?",
+                        (ev.get('numero_op'),)).fetchone()
+    if estado is None:
+        anterior, inicio = 0, _data_iso(ev.get('data_op')) or dia
+        _somar_wip(db, inicio, 1)
+    else:
+        anterior, inicio = estado
+
+    if anterior < 100 <= novo:
+        _somar_wip(db, dia, -1)
+        lead_time = (date.fromisoformat(dia) - date.fromisoformat(inicio)).days
+        db.execute('''INSERT INTO rollup_lead_time (equipamento, soma_dias, qtd) VALUES (?, ?, 1)
+                      ON CONFLICT(equipamento) DO UPDATE SET
+                          soma_dias = soma_dias + excluded.soma_dias, qtd = qtd + 1''',
+                   (equipamento, lead_time))
+    elif anterior >= 100 > novo:
+        _somar_wip(db, dia, 1)
+
+    db.execute("INSERT OR REPLACE INTO estado_op (numero_op, equipamento, progresso, inicio) VALUES (?, ?, ?, ?)",
+               (ev.get('numero_op'), equipamento, novo, inicio))
+
+
+# Lotes de processos diferentes chegam ao banco fora da ordem dos ids (um lote com
+# ids menores pode confirmar depois). Por isso, de tempos em tempos, a atualização
+# relê esta margem abaixo do cursor e pula, pelo id_evento, o que já foi somado.
+# Nas outras vezes busca só depois do cursor (uma consulta vazia se não houver nada novo).
+MARGEM_IDS_EVENTOS = 2000
+INTERVALO_MARGEM_EVENTOS = 300
+
+
+def atualizar_rollups(tamanho_pagina=1000, margem=MARGEM_IDS_EVENTOS):
+    """Aplica nos indicadores os eventos novos, relendo uma margem abaixo do último id processado."""
+    with conexao_local() as db:
+        linha = db.execute("SELECT ultimo_id FROM cursor_eventos WHERE id = 1").fetchone()
+        cursor_inicial = linha[0] if linha else 0
+        # Banco de antes da margem: o que está abaixo do cursor já foi somado
+        legado = cursor_inicial > 0 and not db.execute("SELECT 1 FROM eventos_aplicados LIMIT 1").fetchone()
+        linha = db.execute("SELECT relida_em FROM releitura_eventos WHERE id = 1").fetchone()
+    reler_margem = not linha or time.time() - linha[0] >= INTERVALO_MARGEM_EVENTOS
+
+    inicio = max(0, cursor_inicial - margem) if reler_margem else cursor_inicial
+    aplicados = 0
+    while True:
+        eventos = supabase.ler(lambda c, inicio=inicio: c.table("eventos_progresso").select("*")
+                               .gt("id", inicio).order("id").limit(tamanho_pagina))
+        if not eventos:
+            break
+
+        with conexao_local() as db:
+            db.execute("BEGIN IMMEDIATE")
+            for ev in eventos:
+                # Já aplicado (por este ou outro processo): não soma de novo
+                novo = db.execute("INSERT OR IGNORE INTO eventos_aplicados (id_evento, id) VALUES (?, ?)",
+                                  (ev['id_evento'], ev['id'])).rowcount
+                if novo and not (legado and ev['id'] <= cursor_inicial):
+                    _aplicar_evento(db, ev)
+                    aplicados += 1
+            db.execute('''INSERT INTO cursor_eventos (id, ultimo_id) VALUES (1, ?)
+                          ON CONFLICT(id) DO UPDATE SET ultimo_id = MAX(ultimo_id, excluded.ultimo_id)''',
+                       (eventos[-1]['id'],))
+            # Abaixo da margem nada é relido: não precisa mais lembrar
+            db.execute('''DELETE FROM eventos_aplicados
+                          WHERE id <= (SELECT ultimo_id FROM cursor_eventos WHERE id = 1) - ?''', (margem,))
+
+        inicio = eventos[-1]['id']
+        if len(eventos) < tamanho_pagina:
+            break
+
+    if reler_margem:
+        with conexao_local() as db:
+            db.execute("INSERT OR REPLACE INTO releitura_eventos (id, relida_em) VALUES (1, ?)", (time.time(),))
+    return aplicados
+
+
+def consultar_rollups():
+    with conexao_local() as db:
+        pecas = pd.read_sql_query('''SELECT dia, setor, SUM(concluidas) AS concluidas, SUM(reabertas) AS reabertas
+                                     FROM rollup_pecas_dia GROUP BY dia, setor ORDER BY dia''', db)
+        lead = pd.read_sql_query('''SELECT equipamento, ROUND(soma_dias * 1.0 / qtd, 1) AS lead_time_medio, qtd
+                                    FROM rollup_lead_time WHERE qtd > 0 ORDER BY lead_time_medio DESC''', db)
+        wip = pd.read_sql_query('''SELECT dia, SUM(delta) OVER (ORDER BY dia) AS wip
+                                   FROM rollup_wip_dia ORDER BY dia''', db)
+    return pecas, lead, wip
+
+
+# --- 7.3 ANEXOS DAS OPs (ARMAZENAMENTO POR HASH E MINIATURAS) ---
+PASTA_OBJETOS = os.path.join(PASTA_ANEXOS, "objetos")
+PASTA_MINIATURAS = os.path.join(PASTA_ANEXOS, "miniaturas")
+PASTA_TMP_ANEXOS = os.path.join(PASTA_ANEXOS, "tmp")
+for _pasta in (PASTA_OBJETOS, PASTA_MINIATURAS, PASTA_TMP_ANEXOS):
+    os.makedirs(_pasta, exist_ok=True)
+
+TAMANHO_BLOCO_ANEXO = 1024 * 1024
+TAMANHO_MINIATURA = (240, 240)
+EXTENSOES_IMAGEM = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+
+
+def _gerar_miniatura(sha256, caminho):
+    extensao = os.path.splitext(caminho)[1].lower()
+    destino = os.path.join(PASTA_MINIATURAS, f"{sha256}.png")
+    temporario = f"{destino}.{os.getpid()}.tmp"
+
+    if extensao in EXTENSOES_IMAGEM:
+        from PIL import Image
+        with Image.open(caminho) as img:
+            img.thumbnail(TAMANHO_MINIATURA)
+            img.convert("RGB").save(temporario, "PNG")
+    elif extensao == ".pdf":
+        try:
+            import pymupdf  # requirements.txt; se faltar, os PDFs ficam sem prévia
+        except ImportError:
+            return None
+        with pymupdf.open(caminho) as pdf:
+            pagina = pdf[0]
+            escala = min(TAMANHO_MINIATURA[0] / pagina.rect.width, TAMANHO_MINIATURA[1] / pagina.rect.height)
+            pagina.get_pixmap(matrix=pymupdf.Matrix(escala, escala)).save(temporario, "png")
+    else:
+        return None
+
+    os.replace(temporario, destino)
+    return destino
+
+
+class GeradorMiniaturas:
+    """Pool de threads que gera miniaturas/prévias fora do rerun de quem enviou o arquivo."""
+
+    def __init__(self, trabalhadores=2):
+        self._pool = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="miniaturas")
+        # Retoma o que ficou pendente se o processo caiu no meio
+        with conexao_local() as db:
+            pendentes = db.execute(
+                "SELECT sha256, caminho FROM objetos_anexo WHERE status_miniatura = 'pendente'"
+            ).fetchall()
+        for sha256, caminho in pendentes:
+            self.agendar(sha256, caminho)
+
+    def agendar(self, sha256, caminho):
+        self._pool.submit(self._processar, sha256, caminho)
+
+    def _processar(self, sha256, caminho):
+        try:
+            miniatura = _gerar_miniatura(sha256, caminho)
+            status = "pronta" if miniatura else "sem_previa"
+        except Exception:
+            miniatura, status = None, "erro"
+        with conexao_local() as db:
+            db.execute("UPDATE objetos_anexo SET miniatura = ?, status_miniatura = ? WHERE sha256 = ?",
+                       (miniatura, status, sha256))
+
+
+@st.cache_resource
+def iniciar_gerador_miniaturas():
+    return GeradorMiniaturas()
+
+gerador_miniaturas = iniciar_gerador_miniaturas()
+
+
+def salvar_anexo(numero_op, arquivo):
+    """Grava o arquivo em blocos, deduplicando pelo SHA-256. Retorna False se a OP já tinha esse arquivo."""
+    extensao = os.path.splitext(arquivo.name)[1].lower()
+    hasher = hashlib.sha256()
+    tamanho = 0
+
+    descritor, temporario = tempfile.mkstemp(dir=PASTA_TMP_ANEXOS)
+    with os.fdopen(descritor, "wb") as destino:
+        arquivo.seek(0)
+        while True:
+            bloco = arquivo.read(TAMANHO_BLOCO_ANEXO)
+            if not bloco:
+                break
+            hasher.update(bloco)
+            destino.write(bloco)
+            tamanho += len(bloco)
+    sha256 = hasher.hexdigest()
+
+    with conexao_local() as db:
+        existente = db.execute("SELECT caminho FROM objetos_anexo WHERE sha256 = ?", (sha256,)).fetchone()
+
+    if existente and os.path.exists(existente[0]):
+        # Mesmo conteúdo já guardado (nesta ou em outra OP): só cria o vínculo
+        os.remove(temporario)
+        novo_objeto = False
+    else:
+        caminho = os.path.join(PASTA_OBJETOS, sha256[:2], f"{sha256}{extensao}")
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        os.replace(temporario, caminho)
+        with conexao_local() as db:
+            db.execute('''INSERT OR REPLACE INTO objetos_anexo (sha256, caminho, tamanho, status_miniatura)
+                          VALUES (?, ?, ?, 'pendente')''', (sha256, caminho, tamanho))
+        novo_objeto = True
+
+    with conexao_local() as db:
+        vinculo = db.execute(
+            '''INSERT OR IGNORE INTO anexos (numero_op, sha256, nome_original, enviado_por, data_hora)
+               VALUES (?, ?, ?, ?, ?)''',
+            (str(numero_op), sha256, arquivo.name, st.session_state.get('user_logado', ''),
+             datetime.now().strftime('%d/%m/%Y %H:%M'))
+        )
+
+    if novo_objeto:
+        gerador_miniaturas.agendar(sha256, caminho)
+    return vinculo.rowcount == 1
+
+
+def listar_anexos(numero_op):
+    # Consulta pelo índice idx_anexos_op: não varre a pasta de arquivos
+    with conexao_local() as db:
+        return pd.read_sql_query(
+            '''SELECT a.id, a.nome_original, a.enviado_por, a.data_hora, a.sha256,
+                      o.caminho, o.tamanho, o.miniatura, o.status_miniatura
+               FROM anexos a JOIN objetos_anexo o ON o.sha256 = a.sha256
+               WHERE a.numero_op = ? ORDER BY a.id DESC''', db, params=(str(numero_op),)
+        )
+
+
+def remover_anexo(id_anexo):
+    # Remove só o vínculo; o arquivo some do disco quando nenhuma OP aponta mais para ele
+    with conexao_local() as db:
+        linha = db.execute("SELECT sha256 FROM anexos WHERE id = ?", (id_anexo,)).fetchone()
+        if not linha:
+            return
+        db.execute("DELETE FROM anexos WHERE id = ?", (id_anexo,))
+        em_uso = db.execute("SELECT 1 FROM anexos WHERE sha256 = ? LIMIT 1", linha).fetchone()
+        objeto = None if em_uso else db.execute(
+            "SELECT caminho, miniatura FROM objetos_anexo WHERE sha256 = ?", linha).fetchone()
+        if objeto:
+            db.execute("DELETE FROM objetos_anexo WHERE sha256 = ?", linha)
+
+    for caminho in (objeto or ()):
+        if caminho and os.path.exists(caminho):
+            os.remove(caminho)
+
+
 # --- FUNÇÕES PDF PROFISSIONAL (ADAPTADAS PARA 9 ABAS) ---
 
-def gerar_pdf_relatorio_geral(df_relatorio):
+def gerar_pdf_relatorio_geral(df_relatorio, responsavel=None):
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=1 * cm, leftMargin=1 * cm, topMargin=1 * cm,
                             bottomMargin=1 * cm)
@@ -113,7 +941,8 @@ def gerar_pdf_relatorio_geral(df_relatorio):
     estilo_responsavel = ParagraphStyle('Resp', parent=styles['Normal'], fontSize=12, alignment=1, spaceAfter=20)
 
     # Cabeçalho
-    responsavel = st.session_state.get('user_logado', 'Sistema')
+    # Fora de uma sessão (agendador) o responsável vem por parâmetro
+    responsavel = responsavel or st.session_state.get('user_logado', 'Sistema')
     elementos.append(Paragraph("<b>MAPA GERAL DE PRODUÇÃO - SANTA CRUZ</b>", styles['Title']))
     elementos.append(
         Paragraph(f"Responsável: {responsavel} | Data: {datetime.now().strftime('%d/%m/%Y')}", estilo_responsavel))
@@ -223,6 +1052,814 @@ def gerar_pdf_op(op_raw):
     return buffer.getvalue()
 
 
+# --- FUNÇÕES DE PRAZO, URGÊNCIA E LINHA DO TEMPO ---
+CORES_URGENCIA = {"🟢": "#27ae60", "🟡": "#f1c40f", "🔴": "#e74c3c", "⚪": "#95a5a6"}
+
+# Acima disso o gráfico por OP vira ilegível: agrupamos por máquina e semana
+LIMITE_GANTT_POR_OP = 1500
+
+
+def extrair_cliente_e_entrega(valores):
+    # Tenta busca direta pelos campos padrão
+    cliente_v = valores.get("input_Dados da OP_Cliente") or valores.get("input_Dados da OP_cliente")
+    data_ent_v = valores.get("input_Dados da OP_Data de entrega")
+
+    # Se não achou (por ter renomeado o campo), faz varredura com exclusão de 'endereço'
+    if not cliente_v:
+        for k, v in valores.items():
+            if "cliente" in k.lower() and "endereço" not in k.lower() and "vendedor" not in k.lower():
+                cliente_v = v
+                break
+
+    if not data_ent_v:
+        for k, v in valores.items():
+            if "entrega" in k.lower():
+                data_ent_v = v
+                break
+
+    return cliente_v or "", data_ent_v or ""
+
+
+def classificar_urgencia(data_ent_v):
+    """Retorna (emoji de cor, texto de dias) para a data de entrega 'DD/MM/AAAA'."""
+    if not data_ent_v:
+        return "⚪", ""
+    try:
+        dias_restantes = (datetime.strptime(data_ent_v, '%d/%m/%Y').date() - date.today()).days
+    except:
+        return "⚪", ""
+
+    if dias_restantes > 30:
+        return "🟢", f"({dias_restantes} dias)"
+    elif 15 <= dias_restantes <= 30:
+        return "🟡", f"({dias_restantes} dias)"
+    return "🔴", "(ATRASADA)" if dias_restantes < 0 else f"({dias_restantes} dias)"
+
+
+def faixa_urgencia(dias_restantes):
+    # Mesma regra de classificar_urgencia, aplicada à coluna inteira de uma vez
+    return pd.Series(np.select(
+        [dias_restantes.isna(), dias_restantes > 30, dias_restantes >= 15],
+        ["⚪", "🟢", "🟡"],
+        default="🔴"
+    ), index=dias_restantes.index)
+
+
+def especificacoes_dict(especs):
+    # Algumas linhas chegam com o JSON como texto (mesmo caso tratado em gerar_pdf_op/achatar_op)
+    if isinstance(especs, str):
+        try:
+            especs = json.loads(especs)
+        except ValueError:
+            return {}
+    return especs if isinstance(especs, dict) else {}
+
+
+def datas_entrega(df_ops):
+    """Data de entrega de cada OP como datetime (NaT quando ausente ou inválida)."""
+    entrega = df_ops['data_entrega'] if 'data_entrega' in df_ops.columns else pd.Series("", index=df_ops.index)
+    entrega = entrega.fillna("").astype(str)
+
+    # OPs antigas não têm a coluna data_entrega: cai para o campo dentro das especificações
+    sem_data = entrega.str.strip() == ""
+    if sem_data.any() and 'especificacoes' in df_ops.columns:
+        entrega[sem_data] = df_ops.loc[sem_data, 'especificacoes'].map(
+            lambda e: extrair_cliente_e_entrega(especificacoes_dict(e).get('valores') or {})[1]
+        )
+    return pd.to_datetime(entrega, format='%d/%m/%Y', errors='coerce')
+
+
+def preparar_linha_do_tempo(df_ativa):
+    """Início (data_op), fim (entrega), dias restantes e urgência de cada OP ativa."""
+    tl = pd.DataFrame({
+        'numero_op': df_ativa['numero_op'].astype(str),
+        'equipamento': df_ativa.get('equipamento', pd.Series("", index=df_ativa.index)).fillna("N/A"),
+        'inicio': pd.to_datetime(df_ativa.get('data_op'), format='%d/%m/%Y', errors='coerce'),
+        'fim': datas_entrega(df_ativa),
+    })
+    hoje = pd.Timestamp(date.today())
+    tl['dias'] = (tl['fim'] - hoje).dt.days
+    tl['urgencia'] = faixa_urgencia(tl['dias'])
+    # Sem data de abertura a barra começa hoje (ou na própria entrega, se já passou)
+    tl['inicio'] = tl['inicio'].fillna(tl['fim'].clip(upper=hoje)).fillna(hoje)
+    return tl.dropna(subset=['fim'])
+
+
+def grafico_gantt_por_op(tl):
+    # Um único trace WebGL por cor: cada OP vira um segmento [início, fim, vazio]
+    tl = tl.sort_values('fim')
+    fig = go.Figure()
+    for faixa, grupo in tl.groupby('urgencia', sort=False):
+        n = len(grupo)
+        x = np.empty(n * 3, dtype=object)
+        x[0::3], x[1::3], x[2::3] = grupo['inicio'].to_numpy(), grupo['fim'].to_numpy(), None
+        y = np.repeat(grupo['numero_op'].to_numpy(), 3).astype(object)
+        y[2::3] = None
+        texto = np.repeat((grupo['numero_op'] + " | " + grupo['equipamento'].astype(str)).to_numpy(), 3)
+        fig.add_trace(go.Scattergl(
+            x=x, y=y, mode="lines", name=faixa, text=texto, hoverinfo="text+x",
+            line=dict(color=CORES_URGENCIA[faixa], width=6),
+        ))
+    fig.add_vline(x=pd.Timestamp(date.today()), line_dash="dash", line_color="gray")
+    fig.update_layout(
+        title="Linha do Tempo das OPs Ativas (Abertura → Entrega)",
+        height=min(300 + 12 * len(tl), 1200),
+        yaxis=dict(autorange="reversed", showticklabels=len(tl) <= 80),
+    )
+    return fig
+
+
+def grafico_gantt_agrupado(tl, agrupar_por):
+    # Agregação feita aqui no servidor: o navegador recebe só a matriz de contagens
+    tl = tl.assign(semana=tl['fim'].dt.to_period('W').dt.start_time)
+    if agrupar_por == "Semana":
+        contagem = tl.groupby(['semana', 'urgencia']).size().reset_index(name='ops')
+        return px.bar(contagem, x='semana', y='ops', color='urgencia', color_discrete_map=CORES_URGENCIA,
+                      title="OPs Ativas por Semana de Entrega",
+                      labels={'semana': 'Semana de entrega', 'ops': 'OPs', 'urgencia': 'Urgência'})
+
+    matriz = tl.pivot_table(index='equipamento', columns='semana', values='numero_op', aggfunc='count', fill_value=0)
+    fig = go.Figure(go.Heatmap(
+        z=matriz.to_numpy(), x=matriz.columns, y=matriz.index, colorscale="YlOrRd",
+        hovertemplate="%{y}<br>Semana de %{x|%d/%m/%Y}<br>%{z} OPs<extra></extra>",
+    ))
+    fig.add_vline(x=pd.Timestamp(date.today()), line_dash="dash", line_color="gray")
+    fig.update_layout(title="Entregas por Máquina e Semana", height=min(300 + 20 * len(matriz), 1200))
+    return fig
+
+
+def exibir_linha_do_tempo(df_ativa):
+    tl = preparar_linha_do_tempo(df_ativa)
+    if tl.empty:
+        st.info("Nenhuma OP ativa com data de entrega válida para a linha do tempo.")
+        return
+
+    modos = ["Por OP", "Máquina x Semana", "Semana"]
+    padrao = 0 if len(tl) <= LIMITE_GANTT_POR_OP else 1
+    modo = st.radio("Visualização", modos, index=padrao, horizontal=True, key="modo_gantt")
+
+    if modo == "Por OP":
+        if len(tl) > LIMITE_GANTT_POR_OP:
+            st.caption(f"Exibindo as {LIMITE_GANTT_POR_OP} OPs mais urgentes de {len(tl)}.")
+            tl = tl.nsmallest(LIMITE_GANTT_POR_OP, 'dias')
+        fig = grafico_gantt_por_op(tl)
+    else:
+        fig = grafico_gantt_agrupado(tl, modo)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# --- MOTOR DE PREVISÃO DE ENTREGAS (PCP) ---
+# Sem histórico nenhum, assume que uma OP avança esta quantidade de peças por dia
+TAXA_PADRAO_PECAS_DIA = 1.0
+
+
+def pecas_por_modelo(df_maquinas):
+    """Quantidade de peças do checklist padrão de cada modelo de máquina."""
+    if df_maquinas.empty or 'nome_maquina' not in df_maquinas.columns:
+        return pd.Series(dtype=float)
+    perifericos = df_maquinas.get('perifericos', pd.Series("", index=df_maquinas.index)).fillna("").astype(str)
+    qtd = perifericos.str.split(",").map(lambda itens: sum(1 for p in itens if p.strip()))
+    return pd.Series(qtd.to_numpy(), index=df_maquinas['nome_maquina']).groupby(level=0).max()
+
+
+def taxas_historicas(total_por_modelo):
+    """Peças por dia que uma OP de cada modelo costuma andar, a partir do lead time já medido.
+
+    Retorna (taxa por modelo, taxa geral ponderada pelo número de OPs concluídas).
+    """
+    with conexao_local() as db:
+        lead = pd.read_sql_query("SELECT equipamento, soma_dias, qtd FROM rollup_lead_time WHERE qtd > 0", db)
+    if lead.empty:
+        return pd.Series(dtype=float), TAXA_PADRAO_PECAS_DIA
+
+    lead = lead.set_index('equipamento')
+    dias_medios = (lead['soma_dias'] / lead['qtd']).clip(lower=1)
+    taxas = (total_por_modelo.reindex(lead.index) / dias_medios).dropna()
+    taxas = taxas[taxas > 0]
+    if taxas.empty:
+        return taxas, TAXA_PADRAO_PECAS_DIA
+    taxa_geral = float(np.average(taxas, weights=lead.loc[taxas.index, 'qtd']))
+    return taxas, taxa_geral
+
+
+def prever_entregas(df_ativa, df_maquinas, taxas=None, taxa_geral=None):
+    """Projeta a data de término de cada OP ativa e marca as que vão estourar a entrega.
+
+    Tudo em operações de coluna: recalcular milhares de OPs leva milissegundos.
+    """
+    total_por_modelo = pecas_por_modelo(df_maquinas)
+    if taxas is None:
+        taxas, taxa_geral = taxas_historicas(total_por_modelo)
+
+    equipamento = df_ativa.get('equipamento', pd.Series("", index=df_ativa.index)).fillna("N/A")
+    total = equipamento.map(total_por_modelo).fillna(0)
+
+    if 'especificacoes' in df_ativa.columns:
+        concluidas = df_ativa['especificacoes'].map(
+            lambda e: len(especificacoes_dict(e).get('pecas_concluidas') or [])
+        )
+    else:
+        concluidas = pd.Series(0, index=df_ativa.index)
+    restantes = (total - concluidas).clip(lower=0)
+
+    taxa = equipamento.map(taxas).fillna(taxa_geral or TAXA_PADRAO_PECAS_DIA)
+    # Sem lead time medido para nenhum modelo, a taxa geral é só o chute padrão
+    sem_historico = taxas.empty or not taxa_geral
+    taxa_padrao = ~equipamento.isin(taxas.index) if sem_historico else pd.Series(False, index=df_ativa.index)
+    dias_previstos = np.ceil(restantes / taxa)
+
+    hoje = pd.Timestamp(date.today())
+    previsao = pd.DataFrame({
+        'numero_op': df_ativa['numero_op'].astype(str),
+        'cliente': df_ativa.get('cliente', pd.Series("", index=df_ativa.index)),
+        'equipamento': equipamento,
+        'pecas_restantes': restantes.astype(int),
+        'pecas_dia': taxa.round(2),
+        'taxa_padrao': taxa_padrao,
+        'fim_previsto': hoje + pd.to_timedelta(dias_previstos, unit='D'),
+        'entrega': datas_entrega(df_ativa),
+    })
+    previsao['folga_dias'] = (previsao['entrega'] - previsao['fim_previsto']).dt.days
+    previsao['vai_atrasar'] = previsao['folga_dias'] < 0
+    return previsao
+
+
+def exibir_previsao(previsao):
+    em_risco = previsao[previsao['vai_atrasar']].sort_values('folga_dias')
+
+    col_p1, col_p2, col_p3 = st.columns(3)
+    col_p1.metric("OPs ativas", len(previsao))
+    col_p2.metric("Previsão de atraso", len(em_risco))
+    col_p3.metric("Sem data de entrega", int(previsao['entrega'].isna().sum()))
+
+    qtd_padrao = int(previsao['taxa_padrao'].sum())
+    if qtd_padrao:
+        st.warning(f"⚠️ {qtd_padrao} OP(s) sem histórico de ritmo: previsão feita com a taxa padrão de "
+                   f"{TAXA_PADRAO_PECAS_DIA:g} peça/dia. O histórico vem das OPs concluídas pelo checklist.")
+
+    if em_risco.empty:
+        st.success("✅ Pelo ritmo histórico, todas as OPs com data de entrega ficam prontas no prazo.")
+        return
+
+    st.dataframe(
+        em_risco.assign(
+            fim_previsto=em_risco['fim_previsto'].dt.strftime('%d/%m/%Y'),
+            entrega=em_risco['entrega'].dt.strftime('%d/%m/%Y'),
+        ).drop(columns=['vai_atrasar']),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'numero_op': 'Nº OP', 'cliente': 'Cliente', 'equipamento': 'Máquina',
+            'pecas_restantes': 'Peças Restantes', 'pecas_dia': 'Peças/Dia',
+            'fim_previsto': 'Término Previsto', 'entrega': 'Entrega', 'folga_dias': 'Folga (dias)',
+            'taxa_padrao': 'Taxa Padrão',
+        }
+    )
+
+
+# --- FUNÇÕES DE EXPORTAÇÃO (CSV / EXCEL / PARQUET) ---
+TAMANHO_LOTE_EXPORTACAO = 1000
+
+COLUNAS_BASE_EXPORTACAO = [
+    "numero_op", "cliente", "equipamento", "vendedor", "responsavel_setor",
+    "data_op", "data_entrega", "status", "progresso"
+]
+
+FORMATOS_EXPORTACAO = {
+    "CSV": (".csv", "text/csv"),
+    "Excel (XLSX)": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": (".parquet", "application/octet-stream"),
+}
+
+
+def paginar_ordens(filtros=None, tamanho=TAMANHO_LOTE_EXPORTACAO):
+    """Percorre 'ordens' em lotes, paginando pela chave numero_op (sem OFFSET)."""
+    ultimo = None
+    while True:
+        # select("*"): o PostgREST recusa a consulta inteira se pedirmos uma coluna que
+        # a tabela não tem; as colunas que faltarem saem vazias em achatar_op
+        def consulta(c, ultimo=ultimo):
+            q = montar_consulta(c, "ordens", filtros).order("numero_op").limit(tamanho)
+            return q.gt("numero_op", ultimo) if ultimo is not None else q
+
+        lote = supabase.ler(consulta)
+        if not lote:
+            return
+        yield lote
+        if len(lote) < tamanho:
+            return
+        ultimo = lote[-1]["numero_op"]
+
+
+def achatar_op(op):
+    """Uma linha por OP: colunas fixas + cada campo de especificacoes.valores como coluna."""
+    linha = {c: op.get(c, "") for c in COLUNAS_BASE_EXPORTACAO}
+
+    especs = op.get('especificacoes') or {}
+    if isinstance(especs, str):
+        try:
+            especs = json.loads(especs)
+        except:
+            especs = {}
+
+    for chave, valor in (especs.get('valores') or {}).items():
+        # "input_Dados da OP_Cliente" -> "Dados da OP - Cliente"
+        aba, _, campo = chave.replace("input_", "", 1).partition("_")
+        linha[f"{aba} - {campo}" if campo else aba] = valor
+    return linha
+
+
+def _copiar_csv(origem, destino, colunas):
+    with open(destino, "w", newline="", encoding="utf-8-sig") as saida:
+        escritor = csv.writer(saida)
+        escritor.writerow(colunas)
+        with open(origem, newline="", encoding="utf-8") as entrada:
+            for linha in csv.reader(entrada):
+                # Linhas antigas não têm as colunas descobertas depois: completa com vazio
+                escritor.writerow(linha + [""] * (len(colunas) - len(linha)))
+
+
+def _copiar_xlsx(origem, destino, colunas):
+    import xlsxwriter
+
+    # constant_memory grava linha a linha no disco em vez de montar a planilha na RAM
+    with xlsxwriter.Workbook(destino, {"constant_memory": True}) as livro:
+        aba = livro.add_worksheet("Ordens")
+        aba.write_row(0, 0, colunas)
+        with open(origem, newline="", encoding="utf-8") as entrada:
+            for i, linha in enumerate(csv.reader(entrada), start=1):
+                aba.write_row(i, 0, linha)
+
+
+def _copiar_parquet(origem, destino, colunas):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = pa.schema([(c, pa.string()) for c in colunas])
+    with pq.ParquetWriter(destino, esquema) as escritor, \
+            open(origem, newline="", encoding="utf-8") as entrada:
+        lote = []
+        for linha in csv.reader(entrada):
+            # Linhas antigas não têm as colunas descobertas depois: completa com vazio
+            lote.append(linha + [""] * (len(colunas) - len(linha)))
+            if len(lote) == TAMANHO_LOTE_EXPORTACAO:
+                escritor.write_table(pa.Table.from_arrays([pa.array(c) for c in zip(*lote)], schema=esquema))
+                lote = []
+        if lote:
+            escritor.write_table(pa.Table.from_arrays([pa.array(c) for c in zip(*lote)], schema=esquema))
+
+
+def exportar_ordens(formato, filtros=None):
+    """Gera o arquivo de exportação em disco, lote a lote, e devolve o caminho.
+
+    Como cada OP pode ter campos diferentes, as linhas vão primeiro para um CSV
+    temporário sem cabeçalho; no fim, com todas as colunas conhecidas, o arquivo
+    final é escrito em uma segunda passada sequencial.
+    """
+    colunas = list(COLUNAS_BASE_EXPORTACAO)
+    posicao = {c: i for i, c in enumerate(colunas)}
+
+    sufixo = FORMATOS_EXPORTACAO[formato][0]
+    descritor_spool, spool = tempfile.mkstemp(suffix=".csv")
+    descritor, destino = tempfile.mkstemp(suffix=sufixo)
+    os.close(descritor)
+    try:
+        # A paginação fica dentro do try: erro do Supabase no meio não deixa arquivo para trás
+        with os.fdopen(descritor_spool, "w", newline="", encoding="utf-8") as saida:
+            escritor = csv.writer(saida)
+            for lote in paginar_ordens(filtros):
+                for op in lote:
+                    linha = achatar_op(op)
+                    for c in linha:
+                        if c not in posicao:
+                            posicao[c] = len(colunas)
+                            colunas.append(c)
+                    valores = [""] * len(colunas)
+                    for c, v in linha.items():
+                        valores[posicao[c]] = "" if v is None else v
+                    escritor.writerow(valores)
+
+        if sufixo == ".csv":
+            _copiar_csv(spool, destino, colunas)
+        elif sufixo == ".xlsx":
+            _copiar_xlsx(spool, destino, colunas)
+        else:
+            _copiar_parquet(spool, destino, colunas)
+    except Exception:
+        os.remove(destino)
+        raise
+    finally:
+        os.remove(spool)
+    return destino
+
+
+def painel_exportacao(chave):
+    with st.expander("📤 Exportar Ordens (CSV / Excel / Parquet)"):
+        c_fmt, c_btn = st.columns([3, 1])
+        formato = c_fmt.selectbox("Formato", list(FORMATOS_EXPORTACAO), key=f"fmt_{chave}")
+
+        if c_btn.button("Gerar arquivo", key=f"exp_{chave}", use_container_width=True):
+            try:
+                with st.spinner("Exportando ordens..."):
+                    caminho = exportar_ordens(formato, filtros_escopo_ordens())
+            except ImportError as e:
+                st.error(f"🚨 Biblioteca para {formato} não instalada ({e.name}). Rode: pip install {e.name}")
+                return
+            except Exception as e:
+                st.error(f"Erro ao exportar: {e}")
+                return
+
+            sufixo, mime = FORMATOS_EXPORTACAO[formato]
+            with open(caminho, "rb") as arquivo:
+                st.download_button("📥 Baixar exportação", arquivo, f"ORDENS_{date.today()}{sufixo}", mime,
+                                   key=f"baixar_{chave}", use_container_width=True)
+            os.remove(caminho)
+
+
+# --- ÍNDICE DE CLIENTES E MÁQUINAS (DUPLICIDADE E BUSCA RÁPIDA) ---
+# Palavras que não diferenciam uma empresa de outra ("ACME LTDA" == "ACME")
+SUFIXOS_EMPRESA = {"LTDA", "ME", "EPP", "SA", "S/A", "EIRELI", "MEI", "CIA"}
+# Palavras comuns a muitos nomes: não contam na comparação de nomes parecidos
+# ("TRANSPORTADORA XYZ" não é duplicado de "TRANSPORTADORA ABC")
+PALAVRAS_GENERICAS = {
+    "INDUSTRIA", "IND", "COMERCIO", "COM", "TRANSPORTADORA", "TRANSPORTES", "DISTRIBUIDORA",
+    "EMPRESA", "SERVICOS", "ALIMENTOS", "BEBIDAS", "EMBALAGENS", "QUIMICA", "FARMACEUTICA",
+    "COSMETICOS", "DE", "DA", "DO", "DAS", "DOS", "E",
+}
+LIMIAR_NOME_PARECIDO = 0.6
+LIMITE_SUGESTOES = 30
+LIMITE_DUPLICADOS = 5
+# N-grama presente em mais nomes que isso quase não diferencia ninguém: é pulado
+# (ou, se todos forem assim, só esta quantidade de candidatos é olhada)
+LIMITE_POSTAGEM = 500
+
+
+def dobrar_acentos(texto):
+    """'São João Ind. & Cia' -> 'SAO JOAO IND CIA'"""
+    sem_acento = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^A-Z0-9/]+", " ", sem_acento.upper()).split())
+
+
+def juntar_siglas(texto):
+    """'S.A.' / 'S/A' / 'M.E.' -> 'SA' / 'SA' / 'ME', antes que a pontuação vire espaço."""
+    return re.sub(r"\b(?:[A-Za-z][./])+[A-Za-z]?\b\.?", lambda m: re.sub(r"[./]", "", m.group()), str(texto or ""))
+
+
+def chave_nome(nome):
+    return " ".join(p for p in dobrar_acentos(juntar_siglas(nome)).split() if p not in SUFIXOS_EMPRESA)
+
+
+def chave_distintiva(chave):
+    # Sem as palavras genéricas; se o nome só tiver palavras genéricas, fica como está
+    return " ".join(p for p in chave.split() if p not in PALAVRAS_GENERICAS) or chave
+
+
+def so_digitos(documento):
+    return re.sub(r"\D", "", str(documento or ""))
+
+
+def trigramas(texto):
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceCadastro:
+    """Índice em memória de um cadastro: documento e nome normalizados + n-gramas do nome."""
+
+    def __init__(self, df, campo_nome, campo_doc=None):
+        self.nomes = []
+        self.por_chave = defaultdict(list)
+        self.por_doc = defaultdict(list)
+        self.por_trigrama = defaultdict(set)
+        self.qtd_trigramas = []
+        self.gramas_distintivos = []
+        self.em_ordem = []
+
+        if df.empty or campo_nome not in df.columns:
+            return
+        docs = df[campo_doc] if campo_doc and campo_doc in df.columns else pd.Series("", index=df.index)
+
+        for nome, doc in zip(df[campo_nome].fillna("").astype(str), docs.fillna("")):
+            if not nome.strip():
+                continue
+            i = len(self.nomes)
+            self.nomes.append(nome)
+            chave = chave_nome(nome)
+            self.por_chave[chave].append(i)
+            if so_digitos(doc):
+                self.por_doc[so_digitos(doc)].append(i)
+            gramas = trigramas(chave)
+            self.qtd_trigramas.append(len(gramas))
+            self.gramas_distintivos.append(trigramas(chave_distintiva(chave)))
+            for g in gramas:
+                self.por_trigrama[g].add(i)
+
+        # Lista alfabética pronta para quando a busca estiver vazia
+        self.em_ordem = sorted(set(self.nomes))
+
+    def _candidatos(self, gramas):
+        """Counter {índice: n-gramas em comum}, olhando no máximo LIMITE_POSTAGEM nomes por n-grama."""
+        postagens = sorted((self.por_trigrama[g] for g in gramas if g in self.por_trigrama), key=len)
+        comuns = Counter()
+        for postagem in postagens:
+            if len(postagem) > LIMITE_POSTAGEM:
+                if comuns:
+                    break
+                # Só há n-gramas comuns: usa um pedaço do mais raro
+                comuns.update(itertools.islice(postagem, LIMITE_POSTAGEM))
+                break
+            comuns.update(postagem)
+        return comuns
+
+    def _parecidos(self, texto):
+        """{índice: similaridade de Jaccard} dos nomes que dividem n-gramas com o texto."""
+        gramas = trigramas(texto)
+        comuns = self._candidatos(gramas)
+        return {i: n / (len(gramas) + self.qtd_trigramas[i] - n) for i, n in comuns.items()}
+
+    def duplicados(self, nome, documento=""):
+        """Lista de (nome já cadastrado, motivo) que provavelmente são o mesmo cadastro."""
+        achados = {}
+        digitos = so_digitos(documento)
+        for i in self.por_doc.get(digitos, []) if digitos else []:
+            achados[i] = "mesmo CNPJ/CPF"
+
+        chave = chave_nome(nome)
+        for i in self.por_chave.get(chave, []):
+            achados.setdefault(i, "mesmo nome")
+
+        # Parecidos: comparados só pela parte que distingue um nome do outro
+        gramas = trigramas(chave_distintiva(chave))
+        notas = {}
+        for i in self._candidatos(gramas):
+            distintivos = self.gramas_distintivos[i]
+            comuns = len(gramas & distintivos)
+            notas[i] = comuns / (len(gramas) + len(distintivos) - comuns)
+        for i in sorted(notas, key=notas.get, reverse=True):
+            if notas[i] < LIMIAR_NOME_PARECIDO or len(achados) >= LIMITE_DUPLICADOS:
+                break
+            achados.setdefault(i, f"nome parecido ({notas[i]:.0%})")
+
+        # Documento e nome iguais vêm antes (ordem de inserção); mostra só os mais fortes
+        return [(self.nomes[i], motivo) for i, motivo in list(achados.items())[:LIMITE_DUPLICADOS]]
+
+    def sugerir(self, termo, limite=LIMITE_SUGESTOES):
+        """Nomes que combinam com o que foi digitado, do mais parecido ao menos."""
+        termo = dobrar_acentos(termo)
+        if not termo:
+            return self.em_ordem[:limite]
+
+        notas = self._parecidos(termo)
+        # Quem contém o texto digitado vem sempre antes dos que só se parecem
+        ranking = sorted(notas, key=lambda i: (termo not in dobrar_acentos(self.nomes[i]), -notas[i]))
+        sugestoes = []
+        for i in ranking:
+            if self.nomes[i] not in sugestoes:
+                sugestoes.append(self.nomes[i])
+            if len(sugestoes) == limite:
+                break
+        return sugestoes
+
+
+@st.cache_resource(max_entries=8)
+def _montar_indice(tabela, assinatura, _df, campo_nome, campo_doc):
+    return IndiceCadastro(_df, campo_nome, campo_doc)
+
+
+def assinatura_cadastro(df, colunas):
+    """Hash do conteúdo das colunas indexadas: muda com qualquer nome/documento editado."""
+    presentes = [c for c in colunas if c and c in df.columns]
+    if df.empty or not presentes:
+        return ""
+    hashes = pd.util.hash_pandas_object(df[presentes].astype(str), index=False)
+    return hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+
+
+def obter_indice(tabela, df, campo_nome, campo_doc=None):
+    # Remonta quando o conteúdo muda, inclusive edições feitas direto no Supabase
+    # que chegam pelo TTL com o mesmo número de linhas
+    return _montar_indice(tabela, assinatura_cadastro(df, [campo_nome, campo_doc]), df, campo_nome, campo_doc)
+
+
+def confirmar_duplicado(chave_pendente, gravar):
+    """Mostra os possíveis duplicados guardados em session_state e pede confirmação antes de gravar."""
+    pendente = st.session_state.get(chave_pendente)
+    if not pendente:
+        return
+
+    st.warning("⚠️ Possível cadastro duplicado:\n\n" +
+               "\n".join(f"- **{nome}** — {motivo}" for nome, motivo in pendente['duplicados']))
+    c_sim, c_nao = st.columns(2)
+    if c_sim.button("💾 Salvar mesmo assim", key=f"sim_{chave_pendente}"):
+        try:
+            gravar(pendente['dados'])
+        except Exception as e:
+            # Mantém o cadastro pendente para tentar de novo
+            st.error(f"Erro técnico ao salvar: {e}")
+            return
+        del st.session_state[chave_pendente]
+        st.rerun()
+    if c_nao.button("Cancelar", key=f"nao_{chave_pendente}"):
+        del st.session_state[chave_pendente]
+        st.rerun()
+
+
+# --- 7.4 ROTINAS EM SEGUNDO PLANO (RESULTADOS PRÉ-CALCULADOS) ---
+def montar_relatorio(df_rel, df_maquinas):
+    """Números do Relatório: separa ativas/concluídas e projeta as entregas."""
+    df_rel = df_rel.copy()
+    df_rel['progresso'] = pd.to_numeric(df_rel['progresso'], errors='coerce').fillna(0)
+
+    # Só entra no mapa o que ainda está em fase de estrutura/montagem (Progresso < 100)
+    df_ativa = df_rel[df_rel['progresso'] < 100].copy()
+    return {
+        "df_ativa": df_ativa,
+        "qtd_concluidas": int((df_rel['progresso'] == 100).sum()),
+        "previsao": prever_entregas(df_ativa, df_maquinas) if not df_ativa.empty else None,
+    }
+
+
+def rotina_urgencias():
+    # Mapa numero_op -> (emoji, texto de dias) usado nos cards da Lista de OPs
+    df = carregar_tabela("ordens")
+    urgencias = {}
+    for op_id, especs in zip(df.get('numero_op', []), df.get('especificacoes', [])):
+        valores = especificacoes_dict(especs).get('valores') or {}
+        urgencias[op_id] = classificar_urgencia(extrair_cliente_e_entrega(valores)[1])
+    return urgencias
+
+
+def rotina_relatorio():
+    df_rel = carregar_tabela("ordens")
+    if df_rel.empty:
+        return None
+    relatorio = montar_relatorio(df_rel, carregar_tabela("maquinas"))
+    # PDF do Mapa de Produção feito da mesma cópia: tabela e PDF nunca divergem
+    if not relatorio["df_ativa"].empty:
+        relatorio["mapa_pdf"] = gerar_pdf_relatorio_geral(relatorio["df_ativa"], responsavel="Sistema (automático)")
+    return relatorio
+
+
+class Agendador:
+    """Thread única por processo que recalcula, no intervalo ou logo após gravações,
+    os resultados que as páginas só precisam ler.
+
+    Cada resultado guarda a versão (seção 5.1) das tabelas de que depende. Gravação
+    feita em outro processo sobe essa versão e a rotina roda de novo na próxima
+    verificação. Para o chão de fábrica salvando checklists sem parar não virar um
+    recálculo contínuo, cada rotina roda no máximo uma vez a cada ``minimo_s``: os
+    disparos desse intervalo se juntam numa rodada só, e até lá continua valendo o
+    resultado anterior (com no máximo ``minimo_s`` de idade).
+    """
+
+    def __init__(self, verificacao_s=5):
+        self.verificacao_s = verificacao_s
+        self._rotinas = {}
+        self._resultados = {}
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._historico = deque(maxlen=200)
+        threading.Thread(target=self._laco, daemon=True, name="agendador").start()
+
+    @staticmethod
+    def _versoes(tabelas):
+        try:
+            return {t: cache.versao(t) for t in tabelas}
+        except Exception:
+            # Sem como ler as versões: vale o resultado que houver
+            return None
+
+    def _atualizado(self, nome, versoes_resultado):
+        with self._lock:
+            tabelas = self._rotinas[nome]["tabelas"] if nome in self._rotinas else set()
+        atuais = self._versoes(tabelas)
+        return atuais is None or versoes_resultado is None or atuais == versoes_resultado
+
+    def registrar(self, nome, funcao, intervalo_s, depende_de=(), minimo_s=30):
+        with self._lock:
+            self._rotinas[nome] = {"funcao": funcao, "intervalo": intervalo_s, "minimo": minimo_s,
+                                   "tabelas": set(depende_de), "proxima": 0.0, "rodou_em": 0.0}
+        self._acordar.set()
+
+    @staticmethod
+    def _antecipar(rotina):
+        # Chamar com o lock: adianta a rodada, respeitando o intervalo mínimo desde a última
+        rotina["proxima"] = min(rotina["proxima"], max(time.time(), rotina["rodou_em"] + rotina["minimo"]))
+
+    def disparar(self, tabela=None, forcar=False):
+        # Sem tabela: todas as rotinas. forcar ignora o intervalo mínimo (botão do ADM)
+        with self._lock:
+            for rotina in self._rotinas.values():
+                if tabela is None or tabela in rotina["tabelas"]:
+                    if forcar:
+                        rotina["proxima"] = 0.0
+                    else:
+                        self._antecipar(rotina)
+        self._acordar.set()
+
+    def resultado(self, nome):
+        # (valor, gerado_em), ou None se a rotina ainda não rodou, ou se os dados mudaram
+        # e o resultado já passou do intervalo mínimo (a nova rodada está para sair)
+        with self._lock:
+            pronto = self._resultados.get(nome)
+            minimo = self._rotinas[nome]["minimo"] if nome in self._rotinas else 0
+        if pronto is None:
+            return None
+        if time.time() - pronto[3] >= minimo and not self._atualizado(nome, pronto[2]):
+            return None
+        return pronto[0], pronto[1]
+
+    def historico(self):
+        # Cópia feita sob o lock: a thread do agendador acrescenta enquanto a página lê
+        with self._lock:
+            return list(self._historico)
+
+    def situacao(self):
+        with self._lock:
+            rotinas = dict(self._rotinas)
+            resultados = dict(self._resultados)
+            historico = list(self._historico)
+        linhas = []
+        for nome, rotina in rotinas.items():
+            execucoes = [h for h in historico if h["rotina"] == nome]
+            ultima = execucoes[-1] if execucoes else {}
+            duracoes = [h["duracao_ms"] for h in execucoes]
+            linhas.append({
+                "rotina": nome,
+                "ultima_execucao": ultima.get("inicio"),
+                "duracao_ms": ultima.get("duracao_ms"),
+                "media_ms": round(sum(duracoes) / len(duracoes), 1) if duracoes else None,
+                "execucoes": len(execucoes),
+                "resultado_de": resultados[nome][1] if nome in resultados else None,
+                "proxima_em_s": max(0, round(rotina["proxima"] - time.time())),
+                "erro": ultima.get("erro") or "",
+            })
+        return pd.DataFrame(linhas)
+
+    def _executar(self, nome):
+        with self._lock:
+            rotina = self._rotinas[nome]
+            rotina["rodou_em"] = time.time()
+            rotina["proxima"] = rotina["rodou_em"] + rotina["intervalo"]
+        # Versões lidas antes de rodar: gravação durante a execução força nova rodada
+        versoes = self._versoes(rotina["tabelas"])
+        inicio = datetime.now()
+        t0 = time.perf_counter()
+        erro = None
+        try:
+            valor = rotina["funcao"]()
+            with self._lock:
+                self._resultados[nome] = (valor, inicio, versoes, rotina["rodou_em"])
+        except Exception as e:
+            # Mantém o último resultado bom; a página decide se usa ou recalcula
+            erro = str(e)
+        with self._lock:
+            self._historico.append({"rotina": nome, "inicio": inicio, "erro": erro,
+                                    "duracao_ms": round((time.perf_counter() - t0) * 1000, 1)})
+
+    def _marcar_desatualizadas(self):
+        with self._lock:
+            resultados = {n: r[2] for n, r in self._resultados.items()}
+        for nome, versoes in resultados.items():
+            if not self._atualizado(nome, versoes):
+                with self._lock:
+                    self._antecipar(self._rotinas[nome])
+
+    def _laco(self):
+        while True:
+            self._acordar.clear()
+            self._marcar_desatualizadas()
+            with self._lock:
+                vencidas = [n for n, r in self._rotinas.items() if r["proxima"] <= time.time()]
+            for nome in vencidas:
+                self._executar(nome)
+            with self._lock:
+                proxima = min((r["proxima"] for r in self._rotinas.values()), default=time.time() + 60)
+            # Acorda a cada verificacao_s para notar gravações feitas por outros processos
+            self._acordar.wait(min(self.verificacao_s, max(0.5, proxima - time.time())))
+
+
+@st.cache_resource
+def iniciar_agendador():
+    novo = Agendador()
+    # Primeiro os indicadores: a previsão do Relatório usa o lead time deles. Quem os
+    # dispara é o GravadorEventos, a cada lote enviado (não as gravações em "ordens")
+    novo.registrar("indicadores", atualizar_rollups, 300, depende_de=("eventos_progresso",), minimo_s=15)
+    novo.registrar("urgencias", rotina_urgencias, 300, depende_de=("ordens",), minimo_s=30)
+    # O relatório monta o PDF do Mapa (reportlab): a mais cara, a que menos se repete
+    novo.registrar("relatorio", rotina_relatorio, 300, depende_de=("ordens", "maquinas"), minimo_s=60)
+    return novo
+
+
+agendador = iniciar_agendador()
+
+
+def resultado_pronto(nome):
+    # Valor pré-calculado, ou None para a página calcular na hora
+    pronto = agendador.resultado(nome)
+    return pronto[0] if pronto else None
+
+
 # --- BLOCO DE LOGIN COM CONSULTA AO SUPABASE ---
 if not st.session_state.auth:
     st.title("🏭 ERP Santa Cruz - Sistema de Gestão")
@@ -242,11 +1879,11 @@ if not st.session_state.auth:
 
             # 2. Consulta real no Supabase
             try:
-                res = supabase.table("usuarios").select("*").eq("usuario", u_login).eq("senha", p_senha).eq("ativo",
-                                                                                                            1).execute()
+                res = supabase.ler(lambda c: c.table("usuarios").select("*").eq("usuario", u_login)
+                                   .eq("senha", p_senha).eq("ativo", 1))
 
-                if res.data:
-                    user = res.data[0]
+                if res:
+                    user = res[0]
                     cargo_bd = str(user['cargo']).upper()
                     nivel_bd = str(user['nivel']).upper()
 
@@ -255,7 +1892,7 @@ if not st.session_state.auth:
                         nivel_final = "ADM"
                     elif nivel_bd == "LIDER":
                         nivel_final = "LIDER"
-                    elif nivel_bd == "VENDAS":
+                    elif nivel_bd in ("VENDAS", "VENDEDOR"):
                         nivel_final = "VENDEDOR"
                     elif nivel_bd == "CLIENTE":
                         nivel_final = "CLIENTE"
@@ -286,7 +1923,7 @@ with st.sidebar:
 
     # Inicialização das opções conforme o seu plano:
     if nivel == "ADM":
-        opcoes = ["📊 Relatório", "📋 Lista de OPs", "➕ Nova OP", "⚙️ Configurações"]
+        opcoes = ["📊 Relatório", "📈 Produtividade", "📋 Lista de OPs", "➕ Nova OP", "⚙️ Configurações"]
 
     elif nivel == "VENDEDOR":
         # Vendedor pode ver suas OPs, Relatórios e Criar novas
@@ -324,14 +1961,19 @@ if menu == "⚙️ Configurações":
 
     st.header("⚙️ Gestão Administrativa - Santa Cruz")
 
-    # Criando as 3 abas
-    t1, t2, t3 = st.tabs(["🏗️ Máquinas e Modelos", "🔑 Equipe Interna", "👤 Clientes"])
+    # Criando as 4 abas
+    t1, t2, t3, t4 = st.tabs(["🏗️ Máquinas e Modelos", "🔑 Equipe Interna", "👤 Clientes", "⏱️ Rotinas"])
 
     # --- ABA 1: MÁQUINAS E CHECKLISTS ---
     with t1:
         st.subheader("Gerenciar Máquinas e Periféricos Padrão")
         df_m = buscar_dados("maquinas")
 
+        def gravar_maquina(dados):
+            supabase.table("maquinas").upsert(dados).execute()
+            invalidar_cache("maquinas")
+            st.session_state.edit_maq_id = None
+
         val_n, val_c = "", ""
         if st.session_state.get('edit_maq_id'):
             if not df_m.empty and 'id' in df_m.columns:
@@ -348,17 +1990,25 @@ if menu == "⚙️ Configurações":
             if c_m1.form_submit_button("💾 SALVAR NO SUPABASE"):
                 if n:
                     dados = {"nome_maquina": n.upper(), "perifericos": c}
+                    duplicados = []
                     if st.session_state.get('edit_maq_id'):
                         dados["id"] = st.session_state.edit_maq_id
-                    supabase.table("maquinas").upsert(dados).execute()
-                    st.session_state.edit_maq_id = None
-                    st.success("Máquina atualizada!")
-                    st.rerun()
+                    else:
+                        duplicados = obter_indice("maquinas", df_m, "nome_maquina").duplicados(n)
+
+                    if duplicados:
+                        st.session_state.maquina_pendente = {"dados": dados, "duplicados": duplicados}
+                    else:
+                        gravar_maquina(dados)
+                        st.success("Máquina atualizada!")
+                        st.rerun()
 
             if c_m2.form_submit_button("➕ NOVO / LIMPAR"):
                 st.session_state.edit_maq_id = None
                 st.rerun()
 
+        confirmar_duplicado("maquina_pendente", gravar_maquina)
+
         if not df_m.empty:
             for _, m in df_m.iterrows():
                 m_id = m.get('id')
@@ -370,6 +2020,7 @@ if menu == "⚙️ Configurações":
                         st.rerun()
                     if col3.button("🗑️", key=f"de_m_{m_id}"):
                         supabase.table("maquinas").delete().eq("id", m_id).execute()
+                        invalidar_cache("maquinas")
                         st.rerun()
 
     # --- ABA 2: ACESSOS DA EQUIPE ---
@@ -406,6 +2057,7 @@ if menu == "⚙️ Configurações":
                     if u_senha: dados_u["senha"] = u_senha
                     if st.session_state.get('edit_usr_id'): dados_u["id"] = st.session_state.edit_usr_id
                     supabase.table("usuarios").upsert(dados_u).execute()
+                    invalidar_cache("usuarios")
                     st.session_state.edit_usr_id = None
                     st.success("Salvo com sucesso!")
                     st.rerun()
@@ -428,12 +2080,18 @@ if menu == "⚙️ Configurações":
                             st.rerun()
                         if c4.button("🗑️", key=f"de_u_{u_id}"):
                             supabase.table("usuarios").delete().eq("id", u_id).execute()
+                            invalidar_cache("usuarios")
                             st.rerun()
 
     # --- ABA 3: GESTÃO DE CLIENTES ---
     with t3:
         st.subheader("👤 Cadastro de Clientes")
         st.caption("Estes clientes aparecerão na seleção da Nova OP.")
+        df_cli = buscar_dados("clientes")
+
+        def gravar_cliente(dados_cliente):
+            supabase.table("clientes").insert(dados_cliente).execute()
+            invalidar_cache("clientes")
 
         with st.form("form_cliente_novo", clear_on_submit=True):
             c1, c2 = st.columns(2)
@@ -449,17 +2107,23 @@ if menu == "⚙️ Configurações":
                             "cnpj": cnpj_cli if cnpj_cli else "",
                             "endereco": end_cli if end_cli else ""
                         }
-                        supabase.table("clientes").insert(dados_cliente).execute()
-                        st.success(f"✅ Cliente {n_cli.upper()} cadastrado!")
-                        st.rerun()
+                        duplicados = obter_indice("clientes", df_cli, "nome", "cnpj").duplicados(n_cli, cnpj_cli)
+                        if duplicados:
+                            # Segura o cadastro até o usuário confirmar (o form é limpo no envio)
+                            st.session_state.cliente_pendente = {"dados": dados_cliente, "duplicados": duplicados}
+                        else:
+                            gravar_cliente(dados_cliente)
+                            st.success(f"✅ Cliente {n_cli.upper()} cadastrado!")
+                            st.rerun()
                     except Exception as e:
                         st.error(f"Erro técnico ao salvar: {e}")
                 else:
                     st.warning("O nome do cliente é obrigatório.")
 
+        confirmar_duplicado("cliente_pendente", gravar_cliente)
+
         st.divider()
         try:
-            df_cli = buscar_dados("clientes")
             if not df_cli.empty:
                 for _, cli in df_cli.iterrows():
                     with st.container(border=True):
@@ -470,10 +2134,40 @@ if menu == "⚙️ Configurações":
 
                         if col2.button("🗑️", key=f"del_cli_{cli.get('id')}"):
                             supabase.table("clientes").delete().eq("id", cli.get('id')).execute()
+                            invalidar_cache("clientes")
                             st.rerun()
         except:
             st.info("Ainda não há clientes cadastrados.")
 
+    # --- ABA 4: ROTINAS EM SEGUNDO PLANO ---
+    with t4:
+        st.subheader("Rotinas Pré-calculadas")
+        st.caption("Indicadores, urgências, números do Relatório e Mapa de Produção são recalculados "
+                   "em segundo plano a cada intervalo e logo após qualquer gravação em OPs, "
+                   "inclusive as feitas por outros processos do servidor.")
+
+        if st.button("🔄 Recalcular tudo agora"):
+            agendador.disparar(forcar=True)
+            st.success("Rotinas agendadas. Atualize a página em alguns segundos.")
+
+        df_rotinas = agendador.situacao()
+        if not df_rotinas.empty:
+            st.dataframe(
+                df_rotinas, use_container_width=True, hide_index=True,
+                column_config={
+                    'rotina': 'Rotina', 'ultima_execucao': 'Última Execução', 'duracao_ms': 'Duração (ms)',
+                    'media_ms': 'Média (ms)', 'execucoes': 'Execuções', 'resultado_de': 'Resultado de',
+                    'proxima_em_s': 'Próxima em (s)', 'erro': 'Erro',
+                }
+            )
+        execucoes = agendador.historico()
+        if execucoes:
+            historico = pd.DataFrame(execucoes)
+            st.plotly_chart(px.line(historico, x='inicio', y='duracao_ms', color='rotina', markers=True,
+                                    title="Duração das Últimas Execuções",
+                                    labels={'inicio': 'Início', 'duracao_ms': 'Duração (ms)', 'rotina': 'Rotina'}),
+                            use_container_width=True)
+
 # --- PÁGINA: NOVA OP (VERSÃO COMPLETA E PROTEGIDA) ---
 if menu == "➕ Nova OP":
     # 1. BUSCA DADOS DE APOIO
@@ -482,22 +2176,20 @@ if menu == "➕ Nova OP":
     df_clientes_db = buscar_dados("clientes")
 
     # --- TRATAMENTO DE SEGURANÇA PARA LISTAS ---
-    lista_clientes = []
-    if not df_clientes_db.empty and 'nome' in df_clientes_db.columns:
-        lista_clientes = sorted(df_clientes_db['nome'].unique().tolist())
+    indice_clientes = obter_indice("clientes", df_clientes_db, "nome", "cnpj")
 
     lista_vendedores = []
+    lista_lideres = []
     if not df_usuarios.empty:
         cols_u = df_usuarios.columns.tolist()
         # Filtra vendedores se a coluna 'nivel' existir, senão pega todos para não travar
         if 'nivel' in cols_u and 'nome' in cols_u:
             lista_vendedores = df_usuarios[df_usuarios['nivel'] == 'VENDEDOR']['nome'].tolist()
+            lista_lideres = df_usuarios[df_usuarios['nivel'] == 'LIDER']['nome'].tolist()
         elif 'nome' in cols_u:
             lista_vendedores = df_usuarios['nome'].tolist()
 
-    lista_modelos = []
-    if not df_maquinas.empty and 'nome_maquina' in df_maquinas.columns:
-        lista_modelos = sorted(df_maquinas['nome_maquina'].unique().tolist())
+    indice_modelos = obter_indice("maquinas", df_maquinas, "nome_maquina")
 
     st.title("📄 Ordem de Produção")
     st.caption("Configure a estrutura e preencha os dados técnicos da máquina.")
@@ -565,17 +2257,26 @@ if menu == "➕ Nova OP":
                     # Lógica de campos especiais (Selectboxes)
                     campo_lower = campo.lower()
                     if "modelo da máquina" in campo_lower or "equipamento" in campo_lower:
+                        termo = st.text_input(f"🔍 Buscar {campo}", key=f"busca_{key_input}",
+                                              placeholder="Digite parte do nome...")
                         st.session_state.valores_preenchidos[key_input] = st.selectbox(
-                            campo, ["Selecione..."] + lista_modelos, key=key_input
+                            campo, ["Selecione..."] + indice_modelos.sugerir(termo), key=key_input
                         )
                     elif "cliente" in campo_lower and "endereço" not in campo_lower:
+                        termo = st.text_input(f"🔍 Buscar {campo}", key=f"busca_{key_input}",
+                                              placeholder="Digite parte do nome...")
                         st.session_state.valores_preenchidos[key_input] = st.selectbox(
-                            campo, ["Selecione..."] + lista_clientes, key=key_input
+                            campo, ["Selecione..."] + indice_clientes.sugerir(termo), key=key_input
                         )
                     elif "vendedor" in campo_lower:
                         st.session_state.valores_preenchidos[key_input] = st.selectbox(
                             campo, ["Selecione..."] + lista_vendedores, key=key_input
                         )
+                    elif nome_aba == "Distribuição Interna" and "montagem" in campo_lower:
+                        # Nome igual ao do cadastro: é por ele que o LÍDER enxerga as OPs
+                        st.session_state.valores_preenchidos[key_input] = st.selectbox(
+                            campo, ["Selecione..."] + lista_lideres, key=key_input
+                        )
                     elif "data" in campo_lower:
                         # Campo de texto para data (mantendo flexibilidade de string)
                         st.session_state.valores_preenchidos[key_input] = st.text_input(
@@ -591,17 +2292,27 @@ if menu == "➕ Nova OP":
         if c_salvar.button("🚀 SALVAR ORDEM DE PRODUÇÃO", type="primary", use_container_width=True):
             # Identificação das colunas principais para busca rápida na lista
             n_op_f, maq_f, cli_f = "S/N", "N/A", "Não Informado"
+            vend_f, ent_f, lider_f = "", "", ""
 
             for k, v in st.session_state.valores_preenchidos.items():
                 k_lower = k.lower()
                 if "n° op" in k_lower: n_op_f = v
                 if "modelo da máquina" in k_lower: maq_f = v
-                if "cliente" in k_lower and "endereço" not in k_lower: cli_f = v
+                # Só o "Cliente" da aba "Dados da OP": os campos da aba "Dados do Cliente" (CNPJ...)
+                # também contêm "cliente" e não podem sobrescrever o nome usado no filtro do CLIENTE
+                if (k_lower.startswith("input_dados da op_") and "cliente" in k_lower
+                        and cli_f == "Não Informado" and v and v != "Selecione..."): cli_f = v
+                if "vendedor" in k_lower and not vend_f and v != "Selecione...": vend_f = v
+                if "entrega" in k_lower and not ent_f: ent_f = v
+                if "distribuição interna_montagem" in k_lower and v != "Selecione...": lider_f = v
 
             dados_salvar = {
                 "numero_op": n_op_f,
                 "equipamento": maq_f,
                 "cliente": cli_f,  # Salva na coluna principal para facilitar filtros
+                "vendedor": vend_f,  # Usado no filtro de acesso do VENDEDOR
+                "responsavel_setor": lider_f,  # Usado no filtro de acesso do LIDER
+                "data_entrega": ent_f,
                 "especificacoes": {
                     "estrutura": st.session_state.biblioteca,
                     "valores": st.session_state.valores_preenchidos
@@ -613,6 +2324,7 @@ if menu == "➕ Nova OP":
 
             try:
                 supabase.table("ordens").upsert(dados_salvar, on_conflict="numero_op").execute()
+                invalidar_cache("ordens")
                 st.success(f"✅ Ordem de Produção {n_op_f} salva com sucesso!")
                 st.balloons()
                 # Limpa estados para a próxima
@@ -631,9 +2343,11 @@ if menu == "➕ Nova OP":
 # --- PÁGINA: LISTA DE OPs (VERSÃO COMPLETA E CORRIGIDA) ---
 if menu == "📋 Lista de OPs":
     st.title("📋 Central de Ordens de Produção")
+    painel_exportacao("lista")
 
     # 1. Busca os dados no Supabase
-    df = buscar_dados("ordens")
+    df = buscar_dados("ordens", filtros_escopo_ordens())
+    urgencias = resultado_pronto("urgencias") or {}
 
     if not df.empty:
         # Filtro de busca no topo
@@ -651,48 +2365,13 @@ if menu == "📋 Lista de OPs":
             valores = especs.get('valores', {}) if isinstance(especs, dict) else {}
 
             # --- LÓGICA DO TÍTULO INTELIGENTE (CLIENTE E DATA) ---
-            cliente_v = ""
-            data_ent_v = ""
-
-            # Tenta busca direta pelos campos padrão
-            cliente_v = valores.get("input_Dados da OP_Cliente") or valores.get("input_Dados da OP_cliente")
-            data_ent_v = valores.get("input_Dados da OP_Data de entrega") or valores.get(
-                "input_Dados da OP_Data de entrega")
-
-            # Se não achou (por ter renomeado o campo), faz varredura com exclusão de 'endereço'
-            if not cliente_v:
-                for k, v in valores.items():
-                    if "cliente" in k.lower() and "endereço" not in k.lower() and "vendedor" not in k.lower():
-                        cliente_v = v
-                        break
-
-            if not data_ent_v:
-                for k, v in valores.items():
-                    if "entrega" in k.lower():
-                        data_ent_v = v
-                        break
+            cliente_v, data_ent_v = extrair_cliente_e_entrega(valores)
 
             # Tratamento de textos vazios
             txt_cliente = f" | {cliente_v}" if cliente_v and str(cliente_v).lower() != 'none' else ""
 
             # --- LÓGICA DE CORES (URGÊNCIA) ---
-            cor_alerta = "⚪"
-            dias_texto = ""
-            if data_ent_v:
-                try:
-                    dt_ent = datetime.strptime(data_ent_v, '%d/%m/%Y').date()
-                    dias_restantes = (dt_ent - date.today()).days
-                    if dias_restantes > 30:
-                        cor_alerta = "🟢"
-                        dias_texto = f"({dias_restantes} dias)"
-                    elif 15 <= dias_restantes <= 30:
-                        cor_alerta = "🟡"
-                        dias_texto = f"({dias_restantes} dias)"
-                    else:
-                        cor_alerta = "🔴"
-                        dias_texto = "(ATRASADA)" if dias_restantes < 0 else f"({dias_restantes} dias)"
-                except:
-                    cor_alerta = "⚪"
+            cor_alerta, dias_texto = urgencias.get(op_id) or classificar_urgencia(data_ent_v)
 
             # --- EXIBIÇÃO DO CARD (EXPANDER) ---
             with st.expander(
@@ -790,6 +2469,9 @@ if menu == "📋 Lista de OPs":
                                     "progresso": porcentagem,
                                     "especificacoes": especs_atuais
                                 }).eq("numero_op", op_id_atual).execute()
+                                invalidar_cache("ordens")
+                                registrar_eventos_checklist(op_id_atual, maquina_da_op, row.get('data_op'),
+                                                            pecas_concluidas_no_banco, novas_marcacoes, porcentagem)
 
                                 st.success(f"Salvo! {porcentagem}% concluído.")
                                 st.rerun()
@@ -800,42 +2482,74 @@ if menu == "📋 Lista de OPs":
 
                 with t3:
                     st.subheader("Anexos e Documentos")
-                    st.file_uploader("Subir fotos ou PDF", key=f"file_{op_id}")
-                    st.caption("Nota: Para salvar permanentemente, é necessário configurar o Supabase Storage.")
+                    enviados = st.file_uploader("Subir fotos ou PDF", key=f"file_{op_id}", accept_multiple_files=True)
+
+                    if enviados and st.button(f"💾 Salvar Anexos OP {op_id}", key=f"salvar_anexos_{op_id}"):
+                        novos = sum(salvar_anexo(op_id, arq) for arq in enviados)
+                        repetidos = len(enviados) - novos
+                        st.success(f"{novos} anexo(s) salvo(s)." + (f" {repetidos} já estava(m) nesta OP." if repetidos else ""))
+
+                    df_anexos = listar_anexos(op_id)
+                    if df_anexos.empty:
+                        st.caption("Nenhum anexo nesta OP.")
+
+                    for _, anexo in df_anexos.iterrows():
+                        with st.container(border=True):
+                            c_min, c_info, c_baixar, c_del = st.columns([1, 4, 1, 1])
+                            if anexo['status_miniatura'] == "pronta" and os.path.exists(anexo['miniatura']):
+                                c_min.image(anexo['miniatura'], width=80)
+                            elif anexo['status_miniatura'] == "pendente":
+                                c_min.caption("⏳ gerando prévia")
+                            else:
+                                c_min.write("📄")
+
+                            c_info.write(f"**{anexo['nome_original']}** ({anexo['tamanho'] / 1024:.0f} KB)")
+                            c_info.caption(f"Enviado por {anexo['enviado_por']} em {anexo['data_hora']}")
+
+                            if c_baixar.button("📥", key=f"bx_anx_{anexo['id']}"):
+                                with open(anexo['caminho'], "rb") as f:
+                                    c_baixar.download_button("Baixar", f.read(), anexo['nome_original'],
+                                                             key=f"dl_anx_{anexo['id']}")
+                            if c_del.button("🗑️", key=f"del_anx_{anexo['id']}"):
+                                remover_anexo(anexo['id'])
+                                st.rerun()
 
                 with t4:
                     st.subheader("Controle Administrativo")
                     if st.button(f"🗑️ Deletar Ordem {op_id}", key=f"del_{op_id}"):
                         if st.warning("Deseja mesmo excluir?"):
                             supabase.table("ordens").delete().eq("numero_op", op_id).execute()
+                            invalidar_cache("ordens")
                             st.rerun()
-    else:
+    elif not df.attrs.get("falha"):
         st.info("Nenhuma Ordem de Produção encontrada.")
 
 # --- PÁGINA: RELATÓRIO (LÓGICA ESTRUTURA E GRÁFICOS) ---
 elif menu == "📊 Relatório":
     st.header("📊 Dashboard de Produção Santa Cruz")
+    painel_exportacao("relatorio")
 
-    # 1. Busca dados do Supabase
-    df_rel = buscar_dados("ordens")
+    # 1. Sem filtro de escopo usa o que o agendador já calculou; senão busca e calcula na hora
+    filtros = filtros_escopo_ordens()
+    pronto = agendador.resultado("relatorio") if filtros is None else None
 
-    if not df_rel.empty:
-        # Tratamento de dados
-        df_rel['progresso'] = pd.to_numeric(df_rel['progresso'], errors='coerce').fillna(0)
+    if pronto and pronto[0] is not None:
+        relatorio = pronto[0]
+        st.caption(f"⏱️ Números calculados em segundo plano às {pronto[1].strftime('%H:%M:%S')}.")
+    else:
+        df_rel = buscar_dados("ordens", filtros)
+        relatorio = montar_relatorio(df_rel, buscar_dados("maquinas")) if not df_rel.empty else None
 
-        # --- FILTRO DE "ESTRUTURA" (O que você pediu) ---
-        # Só mostra no relatório o que ainda está em fase de estrutura/montagem (Progresso < 100)
-        df_ativa = df_rel[df_rel['progresso'] < 100].copy()
-        df_concluida = df_rel[df_rel['progresso'] == 100].copy()
+    if relatorio:
+        df_ativa = relatorio["df_ativa"]
 
         # --- VISÃO ADM / PCP (Gráficos) ---
         if st.session_state.nivel == "ADM" or "PCP" in st.session_state.cargo_logado:
             col_m1, col_m2 = st.columns(2)
 
             # Gráfico de Pizza: Geral
-            total_ops = len(df_rel)
             fig_pizza = px.pie(
-                values=[len(df_ativa), len(df_concluida)],
+                values=[len(df_ativa), relatorio["qtd_concluidas"]],
                 names=['Em Andamento', 'Finalizadas'],
                 title="Status Geral da Fábrica",
                 hole=0.4,
@@ -845,7 +2559,7 @@ elif menu == "📊 Relatório":
 
             # Gráfico de Barras: Carga por Líder
             # Gráfico de Barras: Carga por Vendedor ou Equipamento
-            # Mudamos 'responsavel_setor' para 'vendedor' que existe no seu banco
+            # Por vendedor: 'responsavel_setor' só vem preenchido nas OPs novas
             fig_lider = px.bar(
                 df_ativa,
                 x='vendedor',
@@ -858,19 +2572,29 @@ elif menu == "📊 Relatório":
 
         st.divider()
 
+        # --- LINHA DO TEMPO (GANTT) ---
+        st.subheader("🗓️ Linha do Tempo das OPs Ativas")
+        exibir_linha_do_tempo(df_ativa)
+
+        st.divider()
+
+        # --- PREVISÃO DE ENTREGAS ---
+        st.subheader("🔮 Previsão de Entregas (Ritmo Histórico)")
+        if relatorio["previsao"] is not None:
+            exibir_previsao(relatorio["previsao"])
+        else:
+            st.info("Nenhuma OP ativa para prever.")
+
+        st.divider()
+
         # --- MAPA DE PRODUÇÃO ATIVA ---
         st.subheader("🏗️ OPs em Processo (Filtro: Estrutura Pendente)")
 
         if not df_ativa.empty:
-            # Opção de PDF do Mapa Geral
-            df_pdf = df_ativa.rename(columns={
-                'numero_op': 'Nº OP', 'cliente': 'Cliente', 'equipamento': 'Máquina',
-                'responsavel_setor': 'Líder', 'data_entrega': 'Entrega', 'progresso': 'Progresso %'
-            })
-
+            # Opção de PDF do Mapa Geral (pronto do agendador quando a visão é a geral)
             btn_pdf = st.download_button(
                 label="📥 Gerar PDF do Mapa de Produção",
-                data=gerar_pdf_relatorio_geral(df_pdf),
+                data=relatorio.get("mapa_pdf") or gerar_pdf_relatorio_geral(df_ativa),
                 file_name=f"MAPA_PRODUCAO_{date.today()}.pdf",
                 mime="application/pdf",
                 use_container_width=True
@@ -885,9 +2609,65 @@ elif menu == "📊 Relatório":
         else:
             st.success("✅ Nenhuma máquina pendente de estrutura no momento!")
 
-    else:
+    elif pronto or not df_rel.attrs.get("falha"):
         st.info("Sem dados para gerar relatórios.")
 
+# --- PÁGINA: PRODUTIVIDADE (HISTÓRICO DE EVENTOS DO CHECKLIST) ---
+elif menu == "📈 Produtividade":
+    if st.session_state.nivel != "ADM":
+        st.error("🚫 Acesso restrito ao Administrador.")
+        st.stop()
+
+    st.header("📈 Produtividade da Montagem")
+
+    # Os indicadores são atualizados pelo agendador (seção 7.4); a página só lê
+    if st.button("🔄 Atualizar indicadores"):
+        gravador_eventos.enviar_agora()
+        agendador.disparar("eventos_progresso", forcar=True)
+        st.info("Atualização pedida. Recarregue a página em alguns segundos.")
+
+    pronto = agendador.resultado("indicadores")
+    if pronto:
+        st.caption(f"⏱️ Indicadores atualizados às {pronto[1].strftime('%H:%M:%S')}"
+                   f"{f' ({pronto[0]} eventos novos)' if pronto[0] else ''}.")
+    erro = next((h["erro"] for h in reversed(agendador.historico()) if h["rotina"] == "indicadores"), None)
+    if erro:
+        st.warning(f"⚠️ Não foi possível buscar os eventos novos ({erro}). Exibindo os indicadores já calculados.")
+
+    df_pecas, df_lead, df_wip = consultar_rollups()
+
+    if df_pecas.empty:
+        st.info("Ainda não há eventos de checklist registrados.")
+    else:
+        col_p1, col_p2 = st.columns(2)
+        col_p1.metric("Peças concluídas (total)", int(df_pecas['concluidas'].sum()))
+        col_p2.metric("OPs em produção agora", int(df_wip['wip'].iloc[-1]) if not df_wip.empty else 0)
+
+        fig_pecas = px.bar(
+            df_pecas, x='dia', y='concluidas', color='setor',
+            title="Peças Concluídas por Dia e Setor",
+            labels={'dia': 'Dia', 'concluidas': 'Peças', 'setor': 'Setor'}
+        )
+        st.plotly_chart(fig_pecas, use_container_width=True)
+
+        col_g1, col_g2 = st.columns(2)
+        if not df_lead.empty:
+            fig_lead = px.bar(
+                df_lead, x='equipamento', y='lead_time_medio', text='qtd',
+                title="Lead Time Médio por Equipamento (dias)",
+                labels={'equipamento': 'Equipamento', 'lead_time_medio': 'Dias', 'qtd': 'OPs'}
+            )
+            col_g1.plotly_chart(fig_lead, use_container_width=True)
+        else:
+            col_g1.info("Nenhuma OP concluída desde o início do histórico.")
+
+        fig_wip = px.line(df_wip, x='dia', y='wip', title="OPs em Produção (WIP) ao Longo do Tempo",
+                          labels={'dia': 'Dia', 'wip': 'OPs'})
+        col_g2.plotly_chart(fig_wip, use_container_width=True)
+
+    if gravador_eventos.ultimo_erro:
+        st.caption(f"⚠️ Eventos aguardando envio ao servidor: {gravador_eventos.ultimo_erro}")
+
 
 
 
@@ -0,0 +1,587 @@
+"""Teste de carga do ERP Santa Cruz com vários usuários simultâneos.
+
+Sobe um servidor ``streamlit run SITE.OP.py`` de verdade e conecta N sessões a
+ele pelo mesmo websocket que o navegador usa (protocolo protobuf do Streamlit).
+Cada sessão repete o fluxo do chão de fábrica: login, Lista de OPs, busca,
+marcar peça no checklist e salvar, gerar PDF e abrir o Relatório. Assim as N
+sessões disputam o mesmo processo, o mesmo GIL, as mesmas threads e os mesmos
+``st.cache_resource``, como em produção. Os clientes são leves (só montam e
+leem mensagens) e rodam juntos num laço asyncio deste processo.
+
+O Supabase é substituído por um banco falso em memória, num processo à parte
+ligado ao servidor por proxy (as gravações de uma sessão aparecem para as
+outras), com latência de rede configurável, para não tocar nos dados de
+produção. Cada rodada usa um servidor novo numa pasta temporária própria.
+
+Uso:
+    python teste_carga.py --sessoes 1,5,10,20 --iteracoes 3 --ops 500 --latencia-ms 30
+
+Para cada quantidade de sessões mostra reruns por segundo, latência p50/p95/p99
+de cada rerun (do envio até o fim do script), quantas chamadas chegaram ao
+Supabase falso e a memória (RSS) do processo do servidor: ocioso, ao fim da
+rodada com as N sessões abertas e o pico durante a rodada.
+"""
+import argparse
+import asyncio
+import copy
+import itertools
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import urllib.request
+from collections import Counter
+from datetime import date, timedelta
+from multiprocessing.managers import BaseManager
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "SITE.OP.py")
+
+# Tempo máximo esperando um rerun terminar antes de dar a sessão como travada
+LIMITE_RERUN_S = 300
+
+
+# --- 1. SUPABASE FALSO (EM MEMÓRIA) ---
+class RespostaFalsa:
+    def __init__(self, data):
+        self.data = data
+
+
+class ConsultaFalsa:
+    """Imita o encadeamento do postgrest: table().select().eq()...execute().
+
+    Só guarda a descrição da consulta (dados simples, que atravessam processos);
+    quem executa é o BackendFalso.
+    """
+
+    def __init__(self, cliente, tabela):
+        self.cliente = cliente
+        self.tabela = tabela
+        self.operacao = "select"
+        self.colunas = "*"
+        self.filtros = []
+        self.ordem = None
+        self.limite = None
+        self.intervalo = None
+        self.dados = None
+        self.conflito = "id"
+        self.ignorar_duplicados = False
+
+    def select(self, colunas="*", **_):
+        self.colunas = colunas
+        return self
+
+    def eq(self, coluna, valor):
+        self.filtros.append(("eq", coluna, valor))
+        return self
+
+    def gt(self, coluna, valor):
+        self.filtros.append(("gt", coluna, valor))
+        return self
+
+    def order(self, coluna, desc=False):
+        self.ordem = (coluna, desc)
+        return self
+
+    def limit(self, n):
+        self.limite = n
+        return self
+
+    def range(self, inicio, fim):
+        self.intervalo = (inicio, fim)
+        return self
+
+    def insert(self, dados, **_):
+        self.operacao, self.dados = "insert", dados
+        return self
+
+    def upsert(self, dados, on_conflict="id", ignore_duplicates=False, **_):
+        self.operacao, self.dados = "upsert", dados
+        self.conflito, self.ignorar_duplicados = on_conflict, ignore_duplicates
+        return self
+
+    def update(self, dados):
+        self.operacao, self.dados = "update", dados
+        return self
+
+    def delete(self):
+        self.operacao = "delete"
+        return self
+
+    def execute(self):
+        return RespostaFalsa(self.cliente.executar(self))
+
+
+def _casa(linha, filtros):
+    for operador, coluna, valor in filtros:
+        atual = linha.get(coluna)
+        if operador == "eq" and atual != valor:
+            return False
+        if operador == "gt" and (atual is None or not atual > valor):
+            return False
+    return True
+
+
+class ClienteFalso:
+    """O que o app recebe de create_client(): manda cada consulta ao backend comum."""
+
+    def __init__(self, backend, latencia=0.0):
+        self.backend = backend
+        self.latencia = latencia
+
+    def table(self, nome):
+        return ConsultaFalsa(self, nome)
+
+    def executar(self, c):
+        # A latência simula a ida e volta de rede até o Supabase (em paralelo entre sessões)
+        if self.latencia:
+            time.sleep(self.latencia)
+        descricao = {k: v for k, v in vars(c).items() if k != "cliente"}
+        return self.backend.executar(descricao)
+
+
+class BackendFalso:
+    """Banco único da rodada; vive no processo do gerente e atende todas as sessões."""
+
+    def __init__(self):
+        self.tabelas = {}
+        self.chamadas = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def total_chamadas(self):
+        return self.chamadas
+
+    def executar(self, c):
+        c = types.SimpleNamespace(**c)
+        with self._lock:
+            self.chamadas += 1
+            linhas = self.tabelas.setdefault(c.tabela, [])
+            casa = lambda r: _casa(r, c.filtros)
+
+            if c.operacao == "select":
+                resultado = [r for r in linhas if casa(r)]
+                if c.ordem:
+                    coluna = c.ordem[0]
+                    resultado.sort(key=lambda r: (r.get(coluna) is None, r.get(coluna) if r.get(coluna) is not None else ""),
+                                   reverse=c.ordem[1])
+                if c.intervalo:
+                    resultado = resultado[c.intervalo[0]:c.intervalo[1] + 1]
+                if c.limite is not None:
+                    resultado = resultado[:c.limite]
+                if c.colunas != "*":
+                    nomes = [n.strip() for n in c.colunas.split(",")]
+                    resultado = [{n: r.get(n) for n in nomes} for r in resultado]
+                return copy.deepcopy(resultado)
+
+            if c.operacao in ("insert", "upsert"):
+                novos = c.dados if isinstance(c.dados, list) else [c.dados]
+                for dado in copy.deepcopy(novos):
+                    existente = None
+                    if c.operacao == "upsert" and c.conflito in dado:
+                        existente = next((r for r in linhas if r.get(c.conflito) == dado[c.conflito]), None)
+                    if existente is None:
+                        dado.setdefault("id", next(self._ids))
+                        linhas.append(dado)
+                    elif not c.ignorar_duplicados:
+                        existente.update(dado)
+                return novos
+
+            if c.operacao == "update":
+                for r in linhas:
+                    if casa(r):
+                        r.update(copy.deepcopy(c.dados))
+                return []
+
+            self.tabelas[c.tabela] = [r for r in linhas if not casa(r)]
+            return []
+
+    def popular(self, qtd_ops, seed):
+        # Semeado uma vez por rodada: todas as sessões veem exatamente os mesmos dados
+        sorteio = random.Random(seed)
+        pecas = ["Motor", "Esteira", "Painel", "Bicos", "Sensor", "Quadro Elétrico", "Estrutura", "Bomba"]
+        maquinas = [f"MODELO {i:02}" for i in range(12)]
+        clientes = [f"CLIENTE {i:03} LTDA" for i in range(200)]
+        hoje = date.today()
+
+        self.tabelas["maquinas"] = [
+            {"id": next(self._ids), "nome_maquina": m, "perifericos": ", ".join(pecas)} for m in maquinas
+        ]
+        self.tabelas["clientes"] = [
+            {"id": next(self._ids), "nome": c, "cnpj": f"{i:014d}", "endereco": ""} for i, c in enumerate(clientes)
+        ]
+        self.tabelas["usuarios"] = []
+        self.tabelas["eventos_progresso"] = []
+
+        ordens = []
+        for i in range(qtd_ops):
+            entrega = (hoje + timedelta(days=sorteio.randint(-10, 90))).strftime('%d/%m/%Y')
+            cliente = sorteio.choice(clientes)
+            prontas = sorteio.sample(pecas, sorteio.randint(0, len(pecas) - 1))
+            ordens.append({
+                "id": next(self._ids),
+                "numero_op": f"OP{i:05}",
+                "equipamento": sorteio.choice(maquinas),
+                "cliente": cliente,
+                "vendedor": f"VENDEDOR {i % 8}",
+                "data_op": (hoje - timedelta(days=sorteio.randint(0, 60))).strftime('%d/%m/%Y'),
+                "data_entrega": entrega,
+                "status": "Pendente",
+                "progresso": int(len(prontas) / len(pecas) * 100),
+                "especificacoes": {
+                    "estrutura": {"Dados da OP": ["N° Op", "Cliente", "Data de entrega"]},
+                    "valores": {
+                        "input_Dados da OP_N° Op": f"OP{i:05}",
+                        "input_Dados da OP_Cliente": cliente,
+                        "input_Dados da OP_Data de entrega": entrega,
+                    },
+                    "pecas_concluidas": prontas,
+                },
+            })
+        self.tabelas["ordens"] = ordens
+
+
+_backend = None
+
+
+def _backend_da_rodada():
+    # Roda no processo do gerente: todos os proxies apontam para o mesmo banco
+    global _backend
+    if _backend is None:
+        _backend = BackendFalso()
+    return _backend
+
+
+class GerenteCarga(BaseManager):
+    """Processo que guarda o BackendFalso da rodada e o expõe ao servidor por proxy."""
+
+
+GerenteCarga.register("backend", callable=_backend_da_rodada)
+
+
+def instalar_supabase_falso(backend, latencia=0.0):
+    """Coloca o backend falso no lugar do pacote 'supabase' antes do app importar."""
+    modulo = types.ModuleType("supabase")
+    modulo.create_client = lambda *a, **k: ClienteFalso(backend, latencia)
+    modulo.Client = ClienteFalso
+    modulo.ClientOptions = lambda **k: types.SimpleNamespace(**k)
+    sys.modules["supabase"] = modulo
+
+
+# --- 2. SERVIDOR ---
+def servidor(args):
+    """Processo do ``streamlit run``: liga o app ao backend falso da rodada e sobe o servidor."""
+    host, porta = args.gerente.rsplit(":", 1)
+    gerente = GerenteCarga(address=(host, int(porta)), authkey=bytes.fromhex(os.environ["CARGA_CHAVE"]))
+    gerente.connect()
+    instalar_supabase_falso(gerente.backend(), latencia=args.latencia_ms / 1000)
+
+    from streamlit.web import cli
+
+    sys.argv = ["streamlit", "run", APP,
+                "--server.address", "127.0.0.1", "--server.port", str(args.servidor),
+                "--server.headless", "true", "--server.fileWatcherType", "none",
+                "--server.runOnSave", "false", "--browser.gatherUsageStats", "false",
+                "--global.developmentMode", "false"]
+    cli.main()
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def esperar_servidor(processo, porta, log, limite_s=120):
+    fim = time.time() + limite_s
+    while time.time() < fim:
+        if processo.poll() is not None:
+            raise RuntimeError(f"o servidor saiu com código {processo.returncode} (log em {log})")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{porta}/_stcore/health", timeout=2) as resposta:
+                if resposta.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f"o servidor não respondeu em {limite_s} s (log em {log})")
+
+
+def memoria_mb(pid):
+    # RSS atual do processo: /proc no Linux, ps nos demais
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        saida = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout
+        return int(saida.strip()) / 1024
+    except (OSError, ValueError):
+        return float("nan")
+
+
+# --- 3. SESSÃO SIMULADA ---
+class ElementoAusente(Exception):
+    """O fluxo não achou na tela o elemento de que precisava (a mensagem diz qual e em que passo)."""
+
+
+def _chave(widget):
+    # id gerado pelo Streamlit: "$$ID-<hash>-<key>"
+    return widget.id.split("-", 2)[-1]
+
+
+class SessaoSimulada:
+    """Uma aba do navegador: conversa com o servidor pelo websocket do Streamlit.
+
+    Como o front-end, guarda o valor dos widgets que o usuário mexeu e o manda
+    em todo rerun; widgets que saíram da tela ou que o app alterou por
+    session_state deixam de ser enviados.
+    """
+
+    def __init__(self, url, qtd_ops, sorteio):
+        self.url = url
+        self.qtd_ops = qtd_ops
+        self.sorteio = sorteio
+        self.ws = None
+        self.passo = "conectar"
+        self.elementos = []
+        self.estados = {}
+        self.medicoes = []
+        self.excecoes = []
+        self.erro = None
+
+    async def conectar(self):
+        import websockets
+
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None, ping_interval=None)
+
+    async def fechar(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def _rodar(self, passo, *alteracoes):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        self.passo = passo
+        gatilhos = [e for e in alteracoes if e.trigger_value]
+        self.estados.update((e.id, e) for e in alteracoes if not e.trigger_value)
+        pedido = BackMsg()
+        pedido.rerun_script.widget_states.widgets.extend(list(self.estados.values()) + gatilhos)
+
+        inicio = time.perf_counter()
+        await self.ws.send(pedido.SerializeToString())
+        elementos, excecoes = [], []
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await asyncio.wait_for(self.ws.recv(), LIMITE_RERUN_S))
+            tipo = msg.WhichOneof("type")
+            if tipo == "new_session":
+                # Cada execução do script (inclusive a de um st.rerun) redesenha a tela
+                elementos = []
+            elif tipo == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                nome = msg.delta.new_element.WhichOneof("type")
+                elementos.append((nome, getattr(msg.delta.new_element, nome)))
+                if nome == "exception":
+                    excecoes.append(msg.delta.new_element.exception.message)
+            elif tipo == "script_finished" and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        self.medicoes.append((passo, time.perf_counter() - inicio, bool(excecoes)))
+        self.excecoes += excecoes
+
+        self.elementos = elementos
+        na_tela = {getattr(p, "id", None) for _, p in elementos}
+        do_app = {p.id for _, p in elementos if getattr(p, "set_value", False)}
+        self.estados = {i: e for i, e in self.estados.items() if i in na_tela and i not in do_app}
+
+    def _achar(self, tipo, descricao, criterio, obrigatorio=True):
+        achado = next((p for nome, p in reversed(self.elementos) if nome == tipo and criterio(p)), None)
+        if achado is None and obrigatorio:
+            raise ElementoAusente(f"depois de '{self.passo}': {tipo} {descricao} não está na tela")
+        return achado
+
+    def _valor(self, widget, campo):
+        if widget.id in self.estados:
+            return getattr(self.estados[widget.id], campo)
+        return widget.value if widget.set_value else widget.default
+
+    @staticmethod
+    def _estado(widget, **valor):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        return WidgetState(id=widget.id, **valor)
+
+    def _busca(self, obrigatorio=True):
+        return self._achar("text_input", "'🔍 Localizar'", lambda p: p.label.startswith("🔍 Localizar"), obrigatorio)
+
+    def _menu(self, pagina):
+        menu = self._achar("radio", f"do menu com '{pagina}'", lambda p: pagina in p.options)
+        return self._estado(menu, string_value=pagina)
+
+    async def login(self):
+        await self._rodar("abrir")
+        usuario = self._achar("text_input", "'Usuário / Login'", lambda p: p.label.startswith("Usuário"))
+        senha = self._achar("text_input", "'Senha'", lambda p: p.label == "Senha")
+        entrar = self._achar("button", "'Entrar no Sistema'", lambda p: p.label.startswith("Entrar"))
+        await self._rodar("login", self._estado(usuario, string_value="admsantacruz"),
+                          self._estado(senha, string_value="sc2024"), self._estado(entrar, trigger_value=True))
+
+    async def fluxo(self):
+        op = f"OP{self.sorteio.randrange(self.qtd_ops):05}"
+
+        await self._rodar("lista_ops", self._menu("📋 Lista de OPs"))
+        await self._rodar("busca", self._estado(self._busca(), string_value=op))
+
+        # OP sem peça a marcar ou sem PDF na tela (concluída, fora do filtro): o passo é pulado
+        checkbox = self._achar("checkbox", f"'chk_{op}_*'", lambda p: _chave(p).startswith(f"chk_{op}_"), False)
+        if checkbox is not None:
+            marcada = self._valor(checkbox, "bool_value")
+            await self._rodar("marcar_peca", self._estado(checkbox, bool_value=not marcada))
+            salvar = self._achar("button", f"'btn_save_{op}'", lambda p: _chave(p) == f"btn_save_{op}", False)
+            if salvar is not None:
+                await self._rodar("salvar_checklist", self._estado(salvar, trigger_value=True))
+
+        pdf = self._achar("button", f"'pdf_{op}'", lambda p: _chave(p) == f"pdf_{op}", False)
+        if pdf is not None:
+            await self._rodar("gerar_pdf", self._estado(pdf, trigger_value=True))
+
+        busca = self._busca(obrigatorio=False)
+        limpar = [self._estado(busca, string_value="")] if busca is not None else []
+        await self._rodar("dashboard", *limpar, self._menu("📊 Relatório"))
+
+    async def executar(self, iteracoes):
+        try:
+            await self.login()
+            for _ in range(iteracoes):
+                await self.fluxo()
+        except ElementoAusente as e:
+            self.erro = str(e)
+        except Exception as e:
+            self.erro = f"no passo '{self.passo}': {e!r}"
+
+
+# --- 4. MEDIÇÃO ---
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+async def _sessoes_simultaneas(args, url, qtd_sessoes, pid):
+    sessoes = [SessaoSimulada(url, args.ops, random.Random(args.seed + i)) for i in range(qtd_sessoes)]
+    await asyncio.gather(*(s.conectar() for s in sessoes))
+
+    pico = memoria_mb(pid)
+
+    async def amostrar():
+        nonlocal pico
+        while True:
+            pico = max(pico, memoria_mb(pid))
+            await asyncio.sleep(0.2)
+
+    amostrador = asyncio.create_task(amostrar())
+    inicio = time.perf_counter()
+    await asyncio.gather(*(s.executar(args.iteracoes) for s in sessoes))
+    duracao = time.perf_counter() - inicio
+    amostrador.cancel()
+
+    # Medido com as N sessões ainda conectadas
+    final = memoria_mb(pid)
+    await asyncio.gather(*(s.fechar() for s in sessoes))
+    return sessoes, duracao, final, max(pico, final)
+
+
+def rodada(args, qtd_sessoes):
+    pasta = tempfile.mkdtemp(prefix="carga_santa_cruz_")
+    os.makedirs(os.path.join(pasta, ".streamlit"))
+    with open(os.path.join(pasta, ".streamlit", "secrets.toml"), "w") as f:
+        f.write('[supabase]\nurl = "http://supabase-falso"\nkey = "teste"\n')
+
+    chave = os.urandom(16)
+    contexto = multiprocessing.get_context("spawn")
+    with GerenteCarga(address=("127.0.0.1", 0), authkey=chave, ctx=contexto) as gerente:
+        backend = gerente.backend()
+        backend.popular(args.ops, args.seed)
+
+        porta = porta_livre()
+        log = os.path.join(pasta, "servidor.log")
+        comando = [sys.executable, os.path.abspath(__file__), "--servidor", str(porta),
+                   "--gerente", f"{gerente.address[0]}:{gerente.address[1]}", "--latencia-ms", str(args.latencia_ms)]
+        with open(log, "w") as saida:
+            processo = subprocess.Popen(comando, cwd=pasta, env=dict(os.environ, CARGA_CHAVE=chave.hex()),
+                                        stdout=saida, stderr=subprocess.STDOUT)
+        try:
+            esperar_servidor(processo, porta, log)
+            ocioso = memoria_mb(processo.pid)
+            sessoes, duracao, final, pico = asyncio.run(
+                _sessoes_simultaneas(args, f"ws://127.0.0.1:{porta}/_stcore/stream", qtd_sessoes, processo.pid))
+            chamadas = backend.total_chamadas()
+        finally:
+            processo.terminate()
+            try:
+                processo.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+                processo.wait()
+    # Se o servidor não subiu, a pasta fica para consulta do servidor.log
+    shutil.rmtree(pasta, ignore_errors=True)
+    return sessoes, duracao, chamadas, (ocioso, final, pico)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do ERP Santa Cruz (Supabase falso).")
+    parser.add_argument("--sessoes", default="1,5,10", help="Quantidades de sessões simultâneas, separadas por vírgula")
+    parser.add_argument("--iteracoes", type=int, default=3, help="Repetições do fluxo completo por sessão")
+    parser.add_argument("--ops", type=int, default=500, help="Quantidade de OPs no banco falso")
+    parser.add_argument("--latencia-ms", type=float, default=30, help="Latência simulada de cada chamada ao Supabase")
+    parser.add_argument("--por-passo", action="store_true", help="Mostra também o p95 de cada passo do fluxo")
+    parser.add_argument("--seed", type=int, default=42)
+    # Uso interno: o próprio script sobe o servidor do app em outro processo
+    parser.add_argument("--servidor", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--gerente", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.servidor:
+        servidor(args)
+        return
+
+    print(f"Banco falso: {args.ops} OPs | latência {args.latencia_ms:.0f} ms | {args.iteracoes} fluxos por sessão")
+    print(f"{'sessões':>8} {'reruns':>7} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'erros':>6} {'chamadas':>9} {'chamadas/rerun':>15} {'RSS ocioso':>11} {'RSS fim':>8} {'RSS pico':>9}")
+
+    for qtd in (int(n) for n in args.sessoes.split(",")):
+        sessoes, duracao, chamadas, (ocioso, final, pico) = rodada(args, qtd)
+        medicoes = [m for s in sessoes for m in s.medicoes]
+        ms = [segundos * 1000 for _, segundos, _ in medicoes]
+        erros = sum(erro for _, _, erro in medicoes) + sum(1 for s in sessoes if s.erro)
+
+        print(f"{qtd:>8} {len(ms):>7} {len(ms) / duracao:>9.1f} {percentil(ms, 50):>8.0f} "
+              f"{percentil(ms, 95):>8.0f} {percentil(ms, 99):>8.0f} {erros:>6} "
+              f"{chamadas:>9} {chamadas / max(1, len(ms)):>15.2f} "
+              f"{ocioso:>8.0f} MB {final:>5.0f} MB {pico:>6.0f} MB")
+
+        for i, s in enumerate(sessoes, 1):
+            if s.erro:
+                print(f"{'':>8} sessão {i} interrompida {s.erro}")
+        for mensagem, vezes in Counter(m for s in sessoes for m in s.excecoes).most_common():
+            print(f"{'':>8} exceção no app ({vezes}x): {mensagem}")
+        if args.por_passo:
+            por_passo = {}
+            for passo, segundos, _ in medicoes:
+                por_passo.setdefault(passo, []).append(segundos * 1000)
+            for passo, tempos in por_passo.items():
+                print(f"{'':>8} {passo:<18} p95 {percentil(tempos, 95):>7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()